@@ -27,7 +27,7 @@ import argparse
 
 # Import from existing tools
 from lzss_decompressor_final import LZSSDecompressor
-from lzss_compressor_final import compress_lzss_lazy
+from lzss_compressor_final import compress_lzss_lazy, recompress_delta
 from sav_serializer import adler32
 
 # Cape definitions: (hash, expected_id, name)
@@ -336,7 +336,7 @@ def unlock_capes(sav_path: str, output_path: str, verbose: bool = False,
     if block1_modified:
         if verbose:
             print("Recompressing Block 1...")
-        block1_recompressed, _, _ = compress_lzss_lazy(bytes(block1_data))
+        block1_recompressed, _, _ = compress_lzss_lazy(block1_data)
         if verbose:
             print(f"Block 1 recompressed: {len(block1_recompressed)} bytes (was {len(block1_compressed)})")
 
@@ -365,9 +365,14 @@ def unlock_capes(sav_path: str, output_path: str, verbose: bool = False,
     if block4_modified:
         if verbose:
             print("Recompressing Block 4...")
-        block4_recompressed, _, _ = compress_lzss_lazy(bytes(block4_data))
+        # Only the stretch around the flipped flags is recompressed; the rest
+        # of the original token stream is reused (same output as a full pass)
+        block4_recompressed, delta_stats = recompress_delta(
+            block4_decompressed, block4_compressed, block4_data)
         if verbose:
             print(f"Block 4 recompressed: {len(block4_recompressed)} bytes (was {len(block4_compressed)})")
+            reused = delta_stats['replayed_tokens'] + delta_stats['spliced_tokens']
+            print(f"  Reused {reused} of {delta_stats['total_tokens']} original tokens")
 
         # Patch Block 3's Region 4 header with new Block 4 size
         old_b4_size = struct.unpack('<I', bytes(block3_raw[region4_offset+1:region4_offset+4]) + b'\x00')[0]
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+LZSS Match Engine Benchmark
+===========================
+
+Times compress_lzss_lazy() with each match finder engine on the compressed
+streams of a SAV file (Blocks 1, 2 and 4) or an OPTIONS file (Sections 1-3),
+and checks that every engine reproduces the original compressed bytes
+exactly. OPTIONS streams are compressed with the 'options' profile.
+
+With --levels, compares the compression levels instead: time and size of
+each level against 'exact', and a decompression round trip for each.
+
+Usage:
+  python lzss_benchmark.py references/ACBROTHERHOODSAVEGAME0.SAV
+  python lzss_benchmark.py references/OPTIONS --format options
+  python lzss_benchmark.py save.SAV --engines hashchain numpy
+  python lzss_benchmark.py save.SAV --repeat 3
+  python lzss_benchmark.py save.SAV --levels
+"""
+
+import sys
+import time
+import argparse
+
+from lzss_decompressor_final import LZSSDecompressor, find_sections
+from lzss_compressor_final import (compress_lzss_lazy, MATCH_ENGINES, NUMPY_AVAILABLE,
+                                   COMPRESSION_LEVELS, PROFILES)
+from cape_unlocker import parse_sav_blocks
+
+SAV_BLOCKS = ('block1_compressed', 'block2_compressed', 'block4_compressed')
+
+
+def load_streams(path, file_format):
+    """
+    Read the compressed LZSS streams of a SAV or OPTIONS file.
+
+    Returns:
+        List of (label, compressed_bytes)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if file_format == 'options':
+        return [(f"Section {section_num}", compressed)
+                for section_num, _, _, compressed, _ in find_sections(data)]
+
+    blocks = parse_sav_blocks(data)
+    return [(name.split('_')[0].capitalize(), blocks[name]) for name in SAV_BLOCKS]
+
+
+def time_engine(data, engine, repeat, level='exact', profile='sav'):
+    """Compress data with engine, returning (best time in seconds, compressed bytes)"""
+    best = None
+    compressed = b''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = compress_lzss_lazy(data, engine=engine, level=level, profile=profile)[0]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, compressed
+
+
+def run_benchmark(streams, engines, repeat=1, profile='sav'):
+    """
+    Benchmark each engine on the compressed streams.
+
+    Returns True if every engine matched the original bytes on every stream.
+    """
+    decompressor = LZSSDecompressor()
+    all_ok = True
+    totals = {engine: 0.0 for engine in engines}
+
+    for label, original in streams:
+        data = decompressor.decompress(original)
+        print(f"\n{label}: {len(data)} bytes -> {len(original)} bytes")
+
+        baseline = None
+        for engine in engines:
+            elapsed, compressed = time_engine(data, engine, repeat, profile=profile)
+            totals[engine] += elapsed
+            match = compressed == original
+            all_ok = all_ok and match
+            if baseline is None:
+                baseline = elapsed
+            speedup = baseline / elapsed if elapsed > 0 else 0.0
+            print(f"  {engine:<10} {elapsed:8.3f}s  {speedup:6.2f}x  "
+                  f"{'MATCH' if match else 'MISMATCH'}")
+
+    print(f"\nTotal ({len(streams)} streams):")
+    baseline = totals[engines[0]]
+    for engine in engines:
+        speedup = baseline / totals[engine] if totals[engine] > 0 else 0.0
+        print(f"  {engine:<10} {totals[engine]:8.3f}s  {speedup:6.2f}x")
+    print(f"\nSpeedups are relative to '{engines[0]}'")
+
+    return all_ok
+
+
+def run_level_benchmark(streams, repeat=1, profile='sav'):
+    """
+    Compare the compression levels on the compressed streams.
+
+    Returns True if every level decompressed back to the original data and
+    'exact' matched the original compressed bytes.
+    """
+    decompressor = LZSSDecompressor()
+    all_ok = True
+    levels = ('exact',) + tuple(level for level in COMPRESSION_LEVELS if level != 'exact')
+    totals = {level: [0.0, 0] for level in levels}
+
+    for label, original in streams:
+        data = decompressor.decompress(original)
+        print(f"\n{label}: {len(data)} bytes -> {len(original)} bytes")
+
+        exact_time = exact_size = None
+        for level in levels:
+            elapsed, compressed = time_engine(data, 'hashchain', repeat, level, profile)
+            totals[level][0] += elapsed
+            totals[level][1] += len(compressed)
+            if level == 'exact':
+                exact_time, exact_size = elapsed, len(compressed)
+                ok = compressed == original
+                status = 'MATCH' if ok else 'MISMATCH'
+            else:
+                ok = decompressor.decompress(compressed) == data
+                status = 'ROUND TRIP OK' if ok else 'ROUND TRIP FAILED'
+            all_ok = all_ok and ok
+            speedup = exact_time / elapsed if elapsed > 0 else 0.0
+            growth = 100.0 * (len(compressed) - exact_size) / exact_size
+            print(f"  {level:<10} {elapsed:8.3f}s  {speedup:6.2f}x  "
+                  f"{len(compressed):6d} bytes ({growth:+5.1f}%)  {status}")
+
+    print(f"\nTotal ({len(streams)} streams):")
+    exact_time, exact_size = totals['exact']
+    for level in levels:
+        elapsed, size = totals[level]
+        speedup = exact_time / elapsed if elapsed > 0 else 0.0
+        growth = 100.0 * (size - exact_size) / exact_size
+        print(f"  {level:<10} {elapsed:8.3f}s  {speedup:6.2f}x  {size:6d} bytes ({growth:+5.1f}%)")
+    print("\nSpeedups and size changes are relative to 'exact'")
+
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark LZSS match finder engines on a SAV or OPTIONS file',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('input', help='Input SAV or OPTIONS file')
+    parser.add_argument('--format', '-f', choices=sorted(PROFILES), default='sav',
+                        help='Input file type, also selects the encoder profile (default: sav)')
+    parser.add_argument('--engines', nargs='+', choices=MATCH_ENGINES, default=None,
+                        help='Engines to time, first one is the baseline '
+                             '(default: all available, brute first)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Runs per engine and stream, best time is reported (default: 1)')
+    parser.add_argument('--levels', action='store_true',
+                        help='Compare compression levels (speed/size) instead of engines')
+    args = parser.parse_args()
+
+    streams = load_streams(args.input, args.format)
+    if not streams:
+        print(f"ERROR: No compressed streams found in {args.input}")
+        sys.exit(1)
+
+    if args.levels:
+        ok = run_level_benchmark(streams, max(1, args.repeat), args.format)
+        if ok:
+            print("\nSUCCESS: All levels round-tripped and 'exact' matched the original streams")
+        else:
+            print("\nFAILURE: Some levels did not round-trip or 'exact' did not match")
+        sys.exit(0 if ok else 1)
+
+    engines = args.engines
+    if engines is None:
+        engines = ['brute', 'hashchain', 'table']
+        if NUMPY_AVAILABLE:
+            engines.append('numpy')
+        else:
+            print("NumPy not installed - skipping the 'numpy' engine")
+
+    ok = run_benchmark(streams, engines, max(1, args.repeat), args.format)
+    if ok:
+        print("\nSUCCESS: All engines reproduced the original compressed streams")
+    else:
+        print("\nFAILURE: Some engines did not reproduce the original compressed streams")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
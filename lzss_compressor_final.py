@@ -7,33 +7,246 @@ Implements tiebreaking optimization Scenario 1 (Match-Follow-Match):
 When a 3-byte match is followed by another match, and the previous token
 has bottom 2 bits == 0, we can set those bits to 3 and encode the 3-byte
 match as literals instead. This allows better compression in certain patterns.
+
+Match finding:
+The game's match rule (longest match, closest offset on ties, never reaching
+into the 2-byte prefix) is implemented by several engines:
+  - 'hashchain' (default): walks hash chains of earlier positions sharing the
+    same 3-byte (or 2-byte) prefix, so only real candidates are examined
+  - 'brute': the original backward scan over the whole 8192-byte window,
+    kept as the reference implementation
+  - 'table': precomputes the match for every position up front from a suffix
+    array (longest-previous-factor style), after which queries are lookups
+  - 'numpy': scans the window with vectorized comparisons (optional, falls
+    back to 'hashchain' when NumPy is not installed)
+All engines return identical (length, offset) pairs for every position.
+
+Profiles:
+The same engine also reproduces the OPTIONS file encoder, which differs only
+in a few settings (match length limit, short match offset range, no Scenario 1
+or match truncation). PROFILES holds both variants; pass profile='options'.
 """
 
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from itertools import islice
+
+from lzss_decompressor_final import LZSSDecompressor
+
+# NumPy is optional - only the 'numpy' match engine uses it
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
 # Debug counter for Scenario 1 optimization
 scenario1_counter = 0
 
-def add_bit(output, bit_accum, bit_counter, flag_byte_ptr, bit_value):
-    """Add single bit - exact Ghidra implementation"""
-    old_bit_counter = bit_counter
-    
-    if bit_counter == 0:
-        flag_byte_ptr = len(output)
-        output.append(0)
-    
-    bit_counter += 1
-    bit_accum |= (bit_value & 1) << (old_bit_counter & 0x1f)
-    
-    if (bit_counter > 7):
-        output[flag_byte_ptr] = bit_accum & 0xFF
-        bit_accum >>= 8
-        bit_counter -= 8
-        if bit_counter > 0:
-            flag_byte_ptr = len(output)
-            output.append(0)
-    
-    return output, bit_accum, bit_counter, flag_byte_ptr
+# Decision trace token kinds (see DecisionTrace)
+TRACE_LITERAL = 0
+TRACE_MATCH = 1
+
+# File extension and magic of binary decision traces (see DecisionTrace.to_bytes)
+TRACE_EXTENSION = '.lztr'
+TRACE_MAGIC = b'LZTR'
+
+# Match memo hit/miss counters from the last compress_lzss_lazy() call
+match_memo_stats = {'hits': 0, 'misses': 0}
+
+# Segment and resync counters from the last compress_lzss_parallel() call
+parallel_stats = {'segments': 0, 'resyncs': 0, 'rerun_bytes': 0}
+
+# Match finder engines (see create_match_finder)
+MATCH_ENGINES = ('hashchain', 'brute', 'table', 'numpy')
+DEFAULT_MATCH_ENGINE = 'hashchain'
+
+# Sliding window size (furthest offset the match finder will consider)
+WINDOW_SIZE = 8192
+
+# Furthest a single encoding decision reads past its own position:
+# find_optimal_match_length() probes up to 500 bytes into a match, and each
+# probe compares up to 2048 bytes ahead.
+DECISION_REACH = 512 + 2048
+
+# Input bytes StreamingLZSSCompressor compresses per pass over its buffer
+STREAM_SEGMENT_SIZE = 32768
+
+# Input bytes compressed between progress callbacks / cancellation checks
+PROGRESS_INTERVAL = 4096
+
+# Input bytes between checkpoints taken by compress_lzss_checkpointed()
+CHECKPOINT_INTERVAL = 4096
+
+# Smallest segment compress_lzss_parallel() hands to a worker; each worker
+# also links the WINDOW_SIZE bytes of history in front of its segment
+PARALLEL_MIN_SEGMENT_SIZE = 16384
+
+# Compression levels (see compress_lzss_lazy)
+COMPRESSION_LEVELS = ('greedy', 'balanced', 'exact', 'optimal')
+DEFAULT_COMPRESSION_LEVEL = 'exact'
+
+# Hash chain candidates examined per query by the non-exact levels
+LEVEL_CHAIN_LIMITS = {'greedy': 1, 'balanced': 16}
+
+# Largest offset a long match can encode: 13 bits, and 0 is the terminator
+MAX_LONG_OFFSET = 0x1FFF
 
-def find_best_match(data, pos, max_match_length=2048):
+# Two or more equal bytes (see build_runs)
+RUN_PATTERN = re.compile(rb'(.)\1+', re.DOTALL)
+
+
+@dataclass(frozen=True)
+class LZSSProfile:
+    """
+    Settings that differ between the game's LZSS encoders.
+
+    Both file types use the same token format and lazy-matching rules; the
+    OPTIONS encoder is a simpler build of the SAV one:
+      - SAV: matches up to 2048 bytes, short matches up to offset 256, plus
+        the Scenario 1 rule and find_optimal_match_length() truncation
+      - OPTIONS: matches up to 263 bytes, neither extra rule, and long match
+        offsets are kept as offset + 1 internally. That only shows where the
+        +1 value is compared against 256 to pick the short form, so short
+        matches reach offset 255; the stream stores the raw offset either way.
+
+    scenario1 and truncation are the SAV encoder's rules and assume
+    short_max_offset == 256.
+    """
+    name: str
+    max_match_length: int       # Longest match the encoder emits
+    short_max_offset: int       # Largest offset of a short (12-bit) match
+    scenario1: bool             # 3-byte match between matches -> 3 literals
+    truncation: bool            # find_optimal_match_length() look-ahead
+
+    def is_short(self, length, offset):
+        """True if a match is written as a 12-bit short match"""
+        return 2 <= length <= 5 and offset <= self.short_max_offset
+
+
+PROFILES = {
+    'sav': LZSSProfile('sav', max_match_length=2048, short_max_offset=256,
+                       scenario1=True, truncation=True),
+    'options': LZSSProfile('options', max_match_length=263, short_max_offset=255,
+                           scenario1=False, truncation=False),
+}
+DEFAULT_PROFILE = 'sav'
+
+
+def byte_view(data):
+    """Flat unsigned-byte memoryview of any buffer (bytes, bytearray, memoryview, mmap...), no copy"""
+    view = memoryview(data)
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    return view
+
+
+def prefixed_buffer(data):
+    """
+    The compressor's working buffer: the 2-byte zero prefix followed by data.
+
+    bytes.join() copies straight from the input's buffer, so this is the only
+    copy made of the input. The match engines index the result directly in
+    their hot loops, which is why the prefix is real bytes rather than an
+    offset on every access, and why it is bytes (faster to index than a
+    bytearray).
+    """
+    return b''.join((b'\x00\x00', byte_view(data)))
+
+
+def get_profile(profile):
+    """Look up a profile by name ('sav', 'options'); LZSSProfile objects pass through"""
+    if isinstance(profile, LZSSProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown LZSS profile: {profile!r} "
+                         f"(expected one of {', '.join(PROFILES)})") from None
+
+
+class BitWriter:
+    """
+    LZSS output stream: flag bits interleaved with data bytes.
+
+    A flag byte is reserved at the current end of the output when the first
+    bit of a new group is written, bits fill it LSB first (as the game's
+    bit writer does), and the byte is stored once 8 bits are collected. A
+    multi-bit field (e.g. the 4 flag bits of a short match) is written in
+    one call.
+
+    The output is preallocated: every LZSS token costs at most 9 bits per input
+    byte it covers, so len(data) + len(data) // 8 + 8 bytes always fits the
+    data plus the terminator (see worst_case_size).
+    """
+
+    __slots__ = ('buffer', 'size', 'bit_accum', 'bit_counter', 'flag_byte_ptr')
+
+    def __init__(self, capacity=0):
+        self.buffer = bytearray(capacity)
+        self.size = 0
+        self.bit_accum = 0
+        self.bit_counter = 0
+        self.flag_byte_ptr = 0
+
+    @staticmethod
+    def worst_case_size(input_size):
+        """Upper bound on compressed size for input_size bytes of input"""
+        return input_size + input_size // 8 + 8
+
+    def _put(self, value):
+        size = self.size
+        buffer = self.buffer
+        if size < len(buffer):
+            buffer[size] = value
+        else:
+            buffer.append(value)
+        self.size = size + 1
+
+    def write_bits(self, value, count):
+        """Write the low count bits of value, LSB first (count <= 8)"""
+        bit_counter = self.bit_counter
+        if bit_counter == 0:
+            self.flag_byte_ptr = self.size
+            self._put(0)
+
+        bit_accum = self.bit_accum | ((value & ((1 << count) - 1)) << bit_counter)
+        bit_counter += count
+
+        if bit_counter > 7:
+            self.buffer[self.flag_byte_ptr] = bit_accum & 0xFF
+            bit_accum >>= 8
+            bit_counter -= 8
+            if bit_counter > 0:
+                self.flag_byte_ptr = self.size
+                self._put(0)
+
+        self.bit_accum = bit_accum
+        self.bit_counter = bit_counter
+
+    def write_byte(self, value):
+        """Write one data byte"""
+        self._put(value & 0xFF)
+
+    def __getitem__(self, index):
+        return self.buffer[index]
+
+    def getvalue(self):
+        """Store the pending flag bits and return the stream as bytes"""
+        if self.bit_counter > 0:
+            self.buffer[self.flag_byte_ptr] = ((1 << self.bit_counter) - 1) & self.bit_accum
+        return bytes(self.buffer[:self.size])
+
+def find_best_match(data, pos, max_match_length=2048, stats=None):
     """
     Find best match scanning backward from current position.
     Data includes 2-byte prefix, pos >= 2.
@@ -45,6 +258,9 @@ def find_best_match(data, pos, max_match_length=2048):
       remaining = 2048 - 9 = 2039
       2039 = 7 * 255 + 254
       Encoded as: 7 zero bytes followed by 0xFE
+
+    If stats (a CompressionStats) is given, the candidates examined and bytes
+    compared are added to it.
     """
     if pos < 2:
         return 0, 0
@@ -60,17 +276,23 @@ def find_best_match(data, pos, max_match_length=2048):
     # This typically only affects the very end of files with long runs of zeros
     max_offset = min(max_offset, pos - 2)
     
+    examined = 0
+    compared = 0
+
     # Scan BACKWARD from current position (closer matches found last)
     for check_pos in range(pos - 1, max(0, pos - max_offset) - 1, -1):
         offset = pos - check_pos
+        examined += 1
 
         # Quick check: must match at least best_length+1 bytes to be better
         # Check the first and last bytes of potential improvement first
         if best_length >= 2:
             # Check if this position can beat best_length
+            compared += 1
             if data[check_pos] != data[pos]:
                 continue
             if check_pos + best_length < len(data) and pos + best_length < len(data):
+                compared += 1
                 if data[check_pos + best_length] != data[pos + best_length]:
                     continue
 
@@ -79,6 +301,8 @@ def find_best_match(data, pos, max_match_length=2048):
                pos + length < len(data) and
                data[check_pos + length] == data[pos + length]):
             length += 1
+        # Matching bytes plus the one that ended the match
+        compared += length + (length < max_length)
 
         # Update only if strictly longer (keeps first equal match = highest offset)
         if length > best_length and length >= 2:
@@ -89,6 +313,10 @@ def find_best_match(data, pos, max_match_length=2048):
             # Early termination: if we found max_length match, no need to continue
             if best_length >= max_length:
                 break
+
+    if stats is not None:
+        stats.candidates += examined
+        stats.bytes_compared += compared
     
     # NOTE: We return the RAW offset here. The encoder will handle any adjustments needed.
     # Long matches require offset >= 1 (after any encoding adjustment)
@@ -101,9 +329,594 @@ def find_best_match(data, pos, max_match_length=2048):
 
     return best_length, best_offset
 
-def calculate_match_cost(length, offset):
+def build_prefix_chains(data):
+    """
+    Link every position >= 2 to the previous position with the same prefix.
+
+    Returns:
+        (prev2, prev3) lists where prev2[i] / prev3[i] is the closest earlier
+        position sharing the 2-byte / 3-byte prefix at i, or -1
+    """
+    size = len(data)
+    prev2 = [-1] * size
+    prev3 = [-1] * size
+
+    head2 = {}
+    for i in range(2, size - 1):
+        key = (data[i] << 8) | data[i + 1]
+        prev2[i] = head2.get(key, -1)
+        head2[key] = i
+
+    head3 = {}
+    for i in range(2, size - 2):
+        key = (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+        prev3[i] = head3.get(key, -1)
+        head3[key] = i
+
+    return prev2, prev3
+
+
+class BruteForceMatchFinder:
+    """
+    Reference match finder - runs find_best_match() for every query.
+
+    Slow (up to 8192 candidates per position) but it is the original
+    implementation the hash-chain engine is verified against.
+    """
+
+    def __init__(self, data, max_match_length=2048):
+        self.data = data
+        self.max_match_length = max_match_length
+        self.stats = None
+
+    def find(self, pos):
+        return find_best_match(self.data, pos, self.max_match_length, self.stats)
+
+
+def build_runs(data):
+    """
+    Find the runs of equal bytes in data.
+
+    Returns:
+        (run_start, run_left) where run_start[i] is the first position of the
+        run containing i and run_left[i] the number of run bytes from i on
+    """
+    size = len(data)
+    # Most bytes are runs of one; only longer runs need filling in
+    run_start = array('i', range(size))
+    run_left = array('i', [1]) * size
+    for run in RUN_PATTERN.finditer(data):
+        start, end = run.span()
+        run_start[start:end] = array('i', [start]) * (end - start)
+        run_left[start:end] = array('i', range(end - start, 0, -1))
+    return run_start, run_left
+
+
+class HashChainMatchFinder:
+    """
+    Hash-chain match finder producing exactly the same result as find_best_match().
+
+    Every position >= 2 is linked to the previous position sharing its 3-byte
+    prefix (prev3) and its 2-byte prefix (prev2). A query walks the 3-byte chain
+    from the nearest candidate outwards, so candidates are visited in the same
+    order as the brute-force scan (offset 1, 2, 3, ...) and the same
+    "strictly longer only" update keeps the closest offset on ties.
+
+    If no candidate of length >= 3 exists, the best match is the nearest
+    2-byte prefix match (all of them have length 2), which is the head of
+    the 2-byte chain.
+
+    Positions 0 and 1 (the zero prefix) are never inserted into the chains,
+    which is the same rule as find_best_match's max_offset = pos - 2 limit.
+
+    Chains are extended lazily up to the queried position. start skips
+    linking positions that can never be in the window of a query (used when
+    compression resumes part way through the input).
+
+    Runs of one byte value are found up front (see build_runs). When pos is
+    inside a run, a candidate in a run of the same byte needs no comparing
+    unless both runs end equally far ahead:
+      - its run ends later: the match stops where pos's run ends, and so do
+        the matches of all farther candidates in that run - skip the run
+      - its run ends sooner: the match stops where its run ends, and each
+        farther candidate in the run matches one byte more - go straight to
+        the farthest candidate that can still improve
+    so a query in a long zero run costs O(1) per run instead of a walk over
+    up to 8192 run positions, with the same result. The zero prefix is part
+    of the first run but is never linked, so the prefix rule is unchanged.
+
+    max_chain limits how many 3-byte candidates a query examines (None = all).
+    A limited search is no longer game-exact; it is used by the faster
+    compression levels together with a smaller window_size.
+
+    Set stats to a CompressionStats to count candidates and compared bytes.
+    """
+
+    def __init__(self, data, max_match_length=2048, start=2, max_chain=None,
+                 window_size=WINDOW_SIZE):
+        self.data = data if isinstance(data, bytes) else bytes(data)
+        self.max_match_length = max_match_length
+        self.max_chain = max_chain
+        self.window_size = window_size
+
+        size = len(self.data)
+        self.prev2 = [-1] * size
+        self.prev3 = [-1] * size
+        self.head2 = {}
+        self.head3 = {}
+        self.linked = max(2, start)
+        self.run_start, self.run_left = build_runs(self.data)
+        self.stats = None
+
+    def _link(self, end):
+        """Insert positions [self.linked, end) into the chains"""
+        data = self.data
+        size = len(data)
+        prev2 = self.prev2
+        prev3 = self.prev3
+        head2 = self.head2
+        head3 = self.head3
+        get2 = head2.get
+        get3 = head3.get
+
+        for i in range(self.linked, min(end, size - 1)):
+            key = (data[i] << 8) | data[i + 1]
+            prev2[i] = get2(key, -1)
+            head2[key] = i
+            if i < size - 2:
+                key = (key << 8) | data[i + 2]
+                prev3[i] = get3(key, -1)
+                head3[key] = i
+
+        self.linked = max(self.linked, end)
+
+    def find(self, pos):
+        data = self.data
+        size = len(data)
+        if pos < 2:
+            return 0, 0
+        if pos >= self.linked:
+            self._link(pos + 1)
+
+        max_length = min(self.max_match_length, size - pos)
+        if max_length < 2:
+            return 0, 0
+
+        # Same window as find_best_match: offsets 1..min(8192, pos - 2)
+        lowest = max(2, pos - self.window_size)
+
+        best_length = 0
+        best_offset = 0
+        # Only counted when profiling: candidates via the probe budget, and
+        # compared bytes as (extension bytes - 1) per compared candidate and
+        # -1 per run candidate, so that adding the candidate count gives one
+        # byte per skip-check rejection (see the end of find)
+        examined = 0
+        compared = 0
+
+        if max_length >= 3:
+            prev3 = self.prev3
+            check_pos = prev3[pos]
+            run_start = self.run_start
+            run_left = self.run_left
+            pos_run = run_left[pos]
+            # Longest match a candidate in a run of the same byte can reach
+            run_reach = pos_run if pos_run < max_length else max_length
+            probes = self.max_chain
+            if probes is None and self.stats is not None:
+                probes = size
+            max_probes = probes
+            while check_pos >= lowest:
+                if probes is not None:
+                    if probes == 0:
+                        break
+                    probes -= 1
+
+                if pos_run >= 3 and run_left[check_pos] != pos_run:
+                    # Candidate is in a run of the same byte that ends sooner
+                    # or later than pos's run: no need to compare
+                    check_run = run_left[check_pos]
+                    compared -= 1
+                    if check_run > pos_run:
+                        if run_reach > best_length:
+                            best_length = run_reach
+                            best_offset = pos - check_pos
+                            if best_length >= max_length:
+                                break
+                        # Farther candidates in this run match no further
+                        check_pos = prev3[run_start[check_pos]]
+                        continue
+
+                    length = check_run if check_run < run_reach else run_reach
+                    if length > best_length:
+                        best_length = length
+                        best_offset = pos - check_pos
+                        if best_length >= max_length:
+                            break
+
+                    # Farther candidates match one byte more each, up to the
+                    # one whose run ends as far ahead as pos's run
+                    target = check_pos + check_run - run_reach
+                    first = run_start[check_pos]
+                    if target < first:
+                        target = first
+                    if target < lowest:
+                        target = lowest
+                    check_pos = target if target < check_pos else prev3[check_pos]
+                    continue
+
+                # Must match at least best_length+1 bytes to be better
+                if best_length < 3 or data[check_pos + best_length] == data[pos + best_length]:
+                    # First 3 bytes are known to match; extend 16 bytes at a time
+                    length = 3
+                    while (length + 16 <= max_length and
+                           data[check_pos + length:check_pos + length + 16] ==
+                           data[pos + length:pos + length + 16]):
+                        length += 16
+                    while length < max_length and data[check_pos + length] == data[pos + length]:
+                        length += 1
+                    # Bytes past the known prefix, plus the one that ended the match
+                    compared += length - 4 + (length < max_length)
+
+                    if length > best_length:
+                        best_length = length
+                        best_offset = pos - check_pos
+                        if best_length >= max_length:
+                            break
+
+                check_pos = prev3[check_pos]
+            if max_probes is not None:
+                examined = max_probes - probes
+
+        if best_length < 2:
+            # No 3-byte match - nearest 2-byte prefix match wins
+            check_pos = self.prev2[pos]
+            if check_pos >= lowest:
+                best_length = 2
+                best_offset = pos - check_pos
+
+        if self.stats is not None:
+            self.stats.candidates += examined
+            self.stats.bytes_compared += compared + examined
+        return best_length, best_offset
+
+
+def build_suffix_array(data):
+    """
+    Build the suffix array and rank array of data (prefix doubling).
+
+    Returns:
+        (sa, rank) where sa[r] is the start of the r-th smallest suffix
+        and rank[i] is the position of suffix i in sa
+    """
+    size = len(data)
+    sa = list(range(size))
+    rank = list(data)
+    if size < 2:
+        return sa, [0] * size
+
+    shift = size.bit_length() + 1
+    k = 1
+    while True:
+        # Sort by (rank of first k bytes, rank of next k bytes); a suffix that
+        # ends inside the second half sorts before any that continues
+        key = [(rank[i] << shift) | (rank[i + k] + 1 if i + k < size else 0)
+               for i in range(size)]
+        sa.sort(key=key.__getitem__)
+
+        new_rank = [0] * size
+        r = 0
+        prev_key = key[sa[0]]
+        for i in sa:
+            if key[i] != prev_key:
+                r += 1
+                prev_key = key[i]
+            new_rank[i] = r
+        rank = new_rank
+
+        if r == size - 1 or k >= size:
+            break
+        k <<= 1
+
+    return sa, rank
+
+
+def build_lcp_array(data, sa, rank):
+    """
+    Kasai's algorithm: lcp[r] = common prefix length of suffixes sa[r-1] and sa[r].
+    """
+    size = len(data)
+    lcp = [0] * size
+    h = 0
+    for i in range(size):
+        r = rank[i]
+        if r == 0:
+            h = 0
+            continue
+        j = sa[r - 1]
+        while i + h < size and j + h < size and data[i + h] == data[j + h]:
+            h += 1
+        lcp[r] = h
+        if h:
+            h -= 1
+    return lcp
+
+
+class MatchTable:
+    """
+    Precomputed find_best_match() result for every position.
+
+    The table is filled in one pass over the input, from the last position
+    to the first, using the suffix array as a longest-previous-factor index:
+
+    1. All suffixes start in a doubly linked list in suffix-array order. After
+       a position is handled it is unlinked, so when position pos is handled
+       the list holds exactly the suffixes starting at or before pos, and
+       each node keeps its common-prefix length with its list predecessor.
+    2. Walking outwards from pos, the first in-window neighbour on each side
+       gives the longest match on that side; the larger of the two (capped
+       at max_match_length) is the game's best length.
+    3. The game keeps the closest offset among equal lengths. The match at
+       pos+1 usually answers that directly (one byte earlier, same offset);
+       otherwise the closest occurrence is found on the 3-byte hash chain.
+
+    Same window, prefix and tie-break rules as find_best_match(), so the
+    table is interchangeable with the other engines. Memory is two 16-bit
+    entries per position plus the temporary suffix array.
+    """
+
+    def __init__(self, data, max_match_length=2048):
+        self.data = data if isinstance(data, bytes) else bytes(data)
+        self.max_match_length = max_match_length
+        self.lengths, self.offsets = self._build(self.data, max_match_length)
+
+    @staticmethod
+    def _build(data, max_match_length):
+        size = len(data)
+        lengths = array('H', bytes(2 * size))
+        offsets = array('H', bytes(2 * size))
+        if size < 4:
+            return lengths, offsets
+
+        sa, rank = build_suffix_array(data)
+        lcp = build_lcp_array(data, sa, rank)
+        prev2, prev3 = build_prefix_chains(data)
+
+        # Linked list over suffix-array ranks; link_lcp[r] = lcp with predecessor
+        prev_rank = list(range(-1, size - 1))
+        next_rank = list(range(1, size + 1))
+        link_lcp = lcp
+
+        for pos in range(size - 1, 1, -1):
+            r = rank[pos]
+            max_length = min(max_match_length, size - pos)
+
+            if max_length >= 2:
+                lowest = max(2, pos - WINDOW_SIZE)
+                best_length = 1
+
+                # Left side: lcp only shrinks while walking, stop at first valid
+                i = prev_rank[r]
+                common = link_lcp[r]
+                while i >= 0 and common > best_length:
+                    if lowest <= sa[i] < pos:
+                        best_length = min(common, max_length)
+                        break
+                    if link_lcp[i] < common:
+                        common = link_lcp[i]
+                    i = prev_rank[i]
+
+                # Right side
+                i = next_rank[r]
+                common = link_lcp[i] if i < size else 0
+                while i < size and common > best_length:
+                    if lowest <= sa[i] < pos:
+                        best_length = min(common, max_length)
+                        break
+                    i = next_rank[i]
+                    if i < size and link_lcp[i] < common:
+                        common = link_lcp[i]
+
+                if best_length >= 2:
+                    # Closest occurrence with at least best_length matching bytes
+                    check_pos = -1
+                    if offsets[pos + 1] and lengths[pos + 1] == best_length - 1:
+                        candidate = pos - offsets[pos + 1]
+                        if candidate >= lowest and data[candidate] == data[pos]:
+                            check_pos = candidate
+                    if check_pos < 0:
+                        if best_length == 2:
+                            check_pos = prev2[pos]
+                        else:
+                            target = data[pos:pos + best_length]
+                            check_pos = prev3[pos]
+                            while data[check_pos:check_pos + best_length] != target:
+                                check_pos = prev3[check_pos]
+                    lengths[pos] = best_length
+                    offsets[pos] = pos - check_pos
+
+            # Unlink pos so earlier positions only see their own past
+            p = prev_rank[r]
+            n = next_rank[r]
+            if n < size:
+                prev_rank[n] = p
+                if link_lcp[r] < link_lcp[n]:
+                    link_lcp[n] = link_lcp[r]
+            if p >= 0:
+                next_rank[p] = n
+
+        return lengths, offsets
+
+    def find(self, pos):
+        if pos >= len(self.lengths):
+            return 0, 0
+        return self.lengths[pos], self.offsets[pos]
+
+
+class MatchMemo:
+    """
+    Per-compression memo of match finder results, indexed by position.
+
+    The main loop asks for pos+1 during lazy matching and then asks for the
+    same position again on the next iteration; peek_next_decision() and
+    find_optimal_match_length() repeat searches the main loop makes later.
+    With the memo every position is searched at most once.
+
+    Results live in two flat arrays (length -1 = not searched yet), so there
+    is no per-entry object overhead. hits/misses count memo lookups.
+    """
+
+    __slots__ = ('finder', 'lengths', 'offsets', 'hits', 'misses')
+
+    def __init__(self, finder, size):
+        self.finder = finder
+        self.lengths = array('h', [-1]) * size
+        self.offsets = array('H', [0]) * size
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, pos):
+        lengths = self.lengths
+        if pos >= len(lengths):
+            return 0, 0
+        length = lengths[pos]
+        if length >= 0:
+            self.hits += 1
+            return length, self.offsets[pos]
+
+        self.misses += 1
+        length, offset = self.finder.find(pos)
+        lengths[pos] = length
+        self.offsets[pos] = offset
+        return length, offset
+
+
+class NumpyMatchFinder:
+    """
+    Vectorized match finder (requires NumPy).
+
+    The current byte is compared against every position of the window in one
+    array operation, which shortlists the candidates. Runs of equal bytes are
+    resolved without scanning: with run[i] = length of the run starting at i,
+    a candidate q whose run length differs from the run at pos matches for
+    exactly min(run[q], run[pos]) bytes. Only candidates with the same run
+    length are compared further, 32 bytes at a time with one 2-D comparison
+    per step.
+
+    The longest match wins and the closest candidate (highest position) breaks
+    ties, as in find_best_match().
+    """
+
+    CHUNK = 32
+
+    def __init__(self, data, max_match_length=2048):
+        self.data = np.frombuffer(data, dtype=np.uint8)
+        self.max_match_length = max_match_length
+        self.chunk_steps = np.arange(self.CHUNK)
+
+        # run[i] = number of equal bytes starting at i
+        size = len(self.data)
+        starts = np.flatnonzero(self.data[1:] != self.data[:-1]) + 1
+        run_starts = np.concatenate(([0], starts))
+        run_ends = np.concatenate((starts, [size]))
+        self.run = np.repeat(run_ends, run_ends - run_starts) - np.arange(size)
+
+    def find(self, pos):
+        data = self.data
+        size = len(data)
+        if pos < 2:
+            return 0, 0
+
+        max_length = min(self.max_match_length, size - pos)
+        if max_length < 2:
+            return 0, 0
+
+        # Same window as find_best_match: offsets 1..min(8192, pos - 2)
+        lowest = max(2, pos - WINDOW_SIZE)
+        if lowest >= pos:
+            return 0, 0
+
+        candidates = np.flatnonzero(data[lowest:pos] == data[pos])
+        if candidates.size == 0:
+            return 0, 0
+        candidates += lowest
+
+        # Candidates whose run length differs are fully resolved by the run table
+        run = self.run
+        pos_run = int(run[pos])
+        candidate_runs = run[candidates]
+        open_ended = candidate_runs == pos_run
+        lengths = np.minimum(np.minimum(candidate_runs, pos_run), max_length)
+
+        best_length = 0
+        best_pos = -1
+        resolved = candidates[~open_ended]
+        if resolved.size:
+            resolved_lengths = lengths[~open_ended]
+            best_length = int(resolved_lengths.max())
+            best_pos = int(resolved[resolved_lengths == best_length][-1])
+
+        # Same run length: the match continues past the run. Compare the
+        # remaining candidates CHUNK bytes at a time; a row that mismatches is
+        # resolved at its first differing byte, full rows carry on.
+        candidates = candidates[open_ended]
+        length = min(pos_run, max_length)
+        while candidates.size and length < max_length:
+            step = min(self.CHUNK, max_length - length)
+            target = data[pos + length:pos + length + step]
+            mismatch = data[candidates[:, None] + (length + self.chunk_steps[:step])] != target
+            full = ~mismatch.any(axis=1)
+
+            partial = candidates[~full]
+            if partial.size:
+                partial_lengths = mismatch[~full].argmax(axis=1) + length
+                partial_best = int(partial_lengths.max())
+                partial_pos = int(partial[partial_lengths == partial_best][-1])
+                if partial_best > best_length or (partial_best == best_length and partial_pos > best_pos):
+                    best_length = partial_best
+                    best_pos = partial_pos
+
+            candidates = candidates[full]
+            length += step
+
+        if candidates.size and (length > best_length or (length == best_length and int(candidates[-1]) > best_pos)):
+            best_length = length
+            best_pos = int(candidates[-1])
+
+        if best_length < 2:
+            return 0, 0
+        return best_length, pos - best_pos
+
+
+def create_match_finder(data, engine=DEFAULT_MATCH_ENGINE, max_match_length=2048):
+    """
+    Create a match finder over buffered data (2-byte prefix included).
+
+    Args:
+        data: Buffered data with the 2-byte zero prefix
+        engine: One of MATCH_ENGINES ('hashchain', 'brute', 'table' or 'numpy';
+            'numpy' falls back to 'hashchain' if NumPy is not installed)
+        max_match_length: Longest match the finder may return
+
+    Returns:
+        Object with a find(pos) -> (length, offset) method
+    """
+    if engine == 'hashchain':
+        return HashChainMatchFinder(data, max_match_length)
+    if engine == 'brute':
+        return BruteForceMatchFinder(data, max_match_length)
+    if engine == 'table':
+        return MatchTable(data, max_match_length)
+    if engine == 'numpy':
+        if NUMPY_AVAILABLE:
+            return NumpyMatchFinder(data, max_match_length)
+        return HashChainMatchFinder(data, max_match_length)
+    raise ValueError(f"Unknown match engine: {engine!r} (expected one of {MATCH_ENGINES})")
+
+
+def calculate_match_cost(length, offset, short_max_offset=256):
     """Calculate cost in bits for encoding a match"""
-    if 2 <= length <= 5 and offset <= 256:
+    if 2 <= length <= 5 and offset <= short_max_offset:
         # Short match: 1 flag + 1 type + 2 length + 8 offset = 12 bits
         return 12
     elif length < 10:
@@ -114,7 +927,21 @@ def calculate_match_cost(length, offset):
         extra_bytes = (length - 9 + 254) // 255
         return 18 + (extra_bytes * 8)
 
-def find_optimal_match_length(buffered_data, pos, match_length, match_offset):
+def encodable_match_length(length):
+    """
+    Longest length <= length that a match token can represent unambiguously.
+
+    A long match stores length - 9 as 0x00 bytes (+255 each) and a final byte.
+    When length - 9 is a multiple of 255 that final byte is 0x00 too, and the
+    decoder reads it as one more extension byte, so those lengths (264, 519,
+    ...) are shortened by one. Only the non-exact levels use this; the exact
+    encoder keeps the game's behaviour.
+    """
+    if length > 9 and (length - 9) % 255 == 0:
+        return length - 1
+    return length
+
+def find_optimal_match_length(buffered_data, pos, match_length, match_offset, finder=None):
     """
     Find optimal length for a match by looking ahead within it.
 
@@ -123,6 +950,7 @@ def find_optimal_match_length(buffered_data, pos, match_length, match_offset):
     compression by allowing the compressor to take advantage of better opportunities.
 
     Returns the optimal length (may be shorter than match_length).
+    If finder is given, its find() is used instead of find_best_match().
     """
     if match_length < 50:  # Only optimize long matches
         return match_length
@@ -148,7 +976,10 @@ def find_optimal_match_length(buffered_data, pos, match_length, match_offset):
             break
 
         # Find best match at this position
-        future_length, future_offset = find_best_match(buffered_data, future_pos)
+        if finder is not None:
+            future_length, future_offset = finder.find(future_pos)
+        else:
+            future_length, future_offset = find_best_match(buffered_data, future_pos)
 
         if future_length < 50:  # Not a significantly better match
             continue
@@ -177,11 +1008,12 @@ def find_optimal_match_length(buffered_data, pos, match_length, match_offset):
     return best_truncate_at
 
 
-def peek_next_decision(buffered_data, pos, curr_length):
+def peek_next_decision(buffered_data, pos, curr_length, finder=None):
     """
     Peek ahead to determine what the next encoding decision will be.
 
     This is used for Scenario 1 tiebreaking optimization.
+    If finder is given, its find() is used instead of find_best_match().
 
     Returns:
         tuple: (is_match, next_length, next_offset) where is_match indicates
@@ -191,12 +1023,14 @@ def peek_next_decision(buffered_data, pos, curr_length):
     if next_pos >= len(buffered_data):
         return (False, 0, 0)
 
+    find = finder.find if finder is not None else (lambda p: find_best_match(buffered_data, p))
+
     # Find best match at next position
-    next_length, next_offset = find_best_match(buffered_data, next_pos)
+    next_length, next_offset = find(next_pos)
 
     # Apply same lazy matching logic as main loop would
     if next_length >= 2 and next_pos + 1 < len(buffered_data):
-        lookahead_length, lookahead_offset = find_best_match(buffered_data, next_pos + 1)
+        lookahead_length, lookahead_offset = find(next_pos + 1)
 
         # Determine match types
         next_is_short = (2 <= next_length <= 5 and next_offset <= 256)
@@ -232,60 +1066,601 @@ def peek_next_decision(buffered_data, pos, curr_length):
     return (is_match, next_length, next_offset)
 
 
-def compress_lzss_lazy(data):
+class DecisionTrace:
     """
-    Compress using lazy matching (lookahead optimization).
-    Uses 2-byte zero prefix - input starts at buffer position 2.
+    Compact record of the token sequence chosen by the compressor.
 
-    Implements Scenario 1 tiebreaking optimization:
-    - When current match is exactly 3 bytes (length-2 == 1)
-    - And previous token exists with bottom 2 bits == 0
-    - And next decision will be a match (token >= 0x10)
-    - Then: set prev token's bits to 3, encode current as 3 literals
+    One entry per token, stored column-wise in typed arrays instead of a list
+    of tuples:
+      kinds:   TRACE_LITERAL (0) or TRACE_MATCH (1)
+      lengths: match length (1 for literals)
+      offsets: match offset, or the byte value for literals
+
+    Iterating yields the old tuple form - ('L', byte) and ('M', length, offset) -
+    for code that still expects it.
+
+    to_bytes() / from_bytes() store the three columns as they are (5 bytes
+    per token after a 9-byte header: 'LZTR', version, token count), and
+    from_compressed() rebuilds the trace of an existing compressed stream.
+    lzss_trace_diff.py compares traces.
     """
-    global scenario1_counter
-    scenario1_counter = 0
 
-    # Add 2-byte zero prefix
-    buffered_data = bytearray([0x00, 0x00]) + bytearray(data)
+    __slots__ = ('kinds', 'lengths', 'offsets')
 
-    output = bytearray()
-    bit_accum = 0
-    bit_counter = 0
-    flag_byte_ptr = 0
-    decisions = []
+    _HEADER = struct.Struct('<4sBI')
+    _MAGIC = TRACE_MAGIC
+    _VERSION = 1
 
-    # Track previous match token position for Scenario 1
-    # This is the position of byte1 (first byte) of the previous long match,
-    # or the offset byte of the previous short match
-    prev_token_pos = None
-    prev_was_match = False
+    def __init__(self):
+        self.kinds = array('B')
+        self.lengths = array('H')
+        self.offsets = array('H')
 
-    # Start at position 2 (after 2-byte prefix)
-    pos = 2
+    def add_literal(self, byte_val):
+        self.kinds.append(TRACE_LITERAL)
+        self.lengths.append(1)
+        self.offsets.append(byte_val)
+
+    def add_match(self, length, offset):
+        self.kinds.append(TRACE_MATCH)
+        self.lengths.append(length)
+        self.offsets.append(offset)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        for kind, length, offset in zip(self.kinds, self.lengths, self.offsets):
+            if kind == TRACE_LITERAL:
+                yield ('L', offset)
+            else:
+                yield ('M', length, offset)
+
+    def write_text(self, f):
+        """Stream the trace to a text file, one L:xx / M:len,off line per token"""
+        f.writelines(
+            f"L:{offset:02x}\n" if kind == TRACE_LITERAL else f"M:{length},{offset}\n"
+            for kind, length, offset in zip(self.kinds, self.lengths, self.offsets)
+        )
+
+    def to_bytes(self):
+        """Binary trace: header, then the kinds, lengths and offsets columns"""
+        lengths = self.lengths
+        offsets = self.offsets
+        if sys.byteorder == 'big':
+            lengths = array('H', lengths)
+            offsets = array('H', offsets)
+            lengths.byteswap()
+            offsets.byteswap()
+        return b''.join((self._HEADER.pack(self._MAGIC, self._VERSION, len(self.kinds)),
+                         self.kinds.tobytes(), lengths.tobytes(), offsets.tobytes()))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Read a to_bytes() trace"""
+        magic, version, count = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC or version != cls._VERSION:
+            raise ValueError(f"Not a version {cls._VERSION} binary decision trace")
+        start = cls._HEADER.size
+        if len(data) != start + 5 * count:
+            raise ValueError(f"Binary trace of {count} tokens should be {start + 5 * count} "
+                             f"bytes, got {len(data)}")
+        trace = cls()
+        view = memoryview(data)
+        trace.kinds.frombytes(view[start:start + count])
+        trace.lengths.frombytes(view[start + count:start + 3 * count])
+        trace.offsets.frombytes(view[start + 3 * count:])
+        if sys.byteorder == 'big':
+            trace.lengths.byteswap()
+            trace.offsets.byteswap()
+        return trace
+
+    @classmethod
+    def from_compressed(cls, compressed):
+        """Token trace of an existing compressed stream (via LZSSDecompressor.iter_tokens)"""
+        trace = cls()
+        kinds = trace.kinds
+        lengths = trace.lengths
+        offsets = trace.offsets
+        for token in LZSSDecompressor().iter_tokens(compressed):
+            if token[0] == 'L':
+                kinds.append(TRACE_LITERAL)
+                lengths.append(1)
+                offsets.append(token[1])
+            else:
+                kinds.append(TRACE_MATCH)
+                lengths.append(token[1])
+                offsets.append(token[2])
+        return trace
+
+
+@dataclass
+class CompressionStats:
+    """
+    Hot-path counters and phase timings of a compression.
+
+    Pass an instance as stats= to compress_lzss_lazy() (or LZSSCompressor,
+    StreamingLZSSCompressor) and it is filled in; counts add up if the same
+    object is used for several calls. Without one the compressor only pays
+    for a few "is None" checks.
+
+    Match finding:
+      match_queries: find() calls, including the lazy pos+1 lookups,
+          truncation probes and Scenario 1 peeks
+      memo_hits: queries answered by the MatchMemo without searching
+      candidates: window positions the engine examined
+      bytes_compared: bytes compared against those candidates
+      (candidates and bytes_compared are counted by the 'hashchain' and
+      'brute' engines; 'table' and 'numpy' do not examine candidates one at
+      a time and leave them at 0)
+    Decisions:
+      literals, short_matches, long_matches: tokens written
+      lazy_rejections: matches dropped because pos+1 has a longer one
+      cost_rejections: matches dropped because literals are as cheap
+      truncations: long matches shortened by find_optimal_match_length()
+      scenario1: 3-byte matches written as literals by Scenario 1
+    times: seconds per phase - 'setup' (input copy, finder tables),
+      'search' (inside find()), 'encode' (rest of the main loop), 'finish'
+      (terminator); level 'optimal' reports its whole parse as 'optimal'
+    """
+    input_size: int = 0
+    output_size: int = 0
+    match_queries: int = 0
+    memo_hits: int = 0
+    candidates: int = 0
+    bytes_compared: int = 0
+    literals: int = 0
+    short_matches: int = 0
+    long_matches: int = 0
+    lazy_rejections: int = 0
+    cost_rejections: int = 0
+    truncations: int = 0
+    scenario1: int = 0
+    times: dict = field(default_factory=dict)
+
+    def add_time(self, phase, seconds):
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+
+    def format_report(self):
+        """Human readable summary, one counter per line"""
+        lines = [f"Input: {self.input_size} bytes -> {self.output_size} bytes"]
+        searches = self.match_queries - self.memo_hits
+        lines.append(f"Match queries: {self.match_queries} ({self.memo_hits} memo hits, "
+                     f"{searches} searches)")
+        if searches:
+            lines.append(f"Candidates examined: {self.candidates} "
+                         f"({self.candidates / searches:.1f} per search)")
+            lines.append(f"Bytes compared: {self.bytes_compared} "
+                         f"({self.bytes_compared / searches:.1f} per search)")
+        lines.append(f"Tokens: {self.literals} literals, {self.short_matches} short matches, "
+                     f"{self.long_matches} long matches")
+        lines.append(f"Lazy rejections: {self.lazy_rejections}")
+        lines.append(f"Cost rejections: {self.cost_rejections}")
+        lines.append(f"Truncations: {self.truncations}")
+        lines.append(f"Scenario 1: {self.scenario1}")
+        total = sum(self.times.values())
+        for phase, seconds in self.times.items():
+            share = 100 * seconds / total if total > 0 else 0.0
+            lines.append(f"Time {phase}: {seconds:.3f}s ({share:.0f}%)")
+        return '\n'.join(lines)
+
+
+class TimedMatchFinder:
+    """
+    Match finder wrapper counting queries and their time into a CompressionStats.
+
+    Only inserted while profiling, so an unprofiled find() has no clock calls.
+    """
+
+    __slots__ = ('finder', 'stats')
+
+    def __init__(self, finder, stats):
+        self.finder = finder
+        self.stats = stats
+
+    def find(self, pos):
+        start = time.perf_counter()
+        result = self.finder.find(pos)
+        stats = self.stats
+        stats.add_time('search', time.perf_counter() - start)
+        stats.match_queries += 1
+        return result
+
+
+class CompressionCancelled(Exception):
+    """Raised when a compression's CancellationToken is cancelled"""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for a compression.
+
+    Pass as cancel= to compress_lzss_lazy() (or the other entry points) and
+    call cancel() from another thread or from the progress callback. With
+    timeout (seconds) the token also cancels itself once that much time has
+    passed since it was created. The compressor checks the token every
+    PROGRESS_INTERVAL input bytes and raises CompressionCancelled.
+    """
+
+    def __init__(self, timeout=None):
+        self.reason = None
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+
+    def cancel(self, reason="Compression cancelled"):
+        if self.reason is None:
+            self.reason = reason
+
+    def is_cancelled(self):
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = "Compression time budget exceeded"
+        return self.reason is not None
+
+    def check(self):
+        """Raise CompressionCancelled if the token has been cancelled"""
+        if self.is_cancelled():
+            raise CompressionCancelled(self.reason)
+
+
+@dataclass(frozen=True)
+class CompressorCheckpoint:
+    """
+    Snapshot of an LZSSCompressor between two steps.
+
+    Holds everything besides the input and the output bytes that the rest of
+    the compression depends on: the BitWriter state (output size, flag byte
+    pointer, pending flag bits), the Scenario 1 state and the settings. The
+    window is not stored; it is part of the input, which must be the same up
+    to verified_size (checked with input_crc, see matches). The output bytes
+    come from the finished compressed stream the checkpoint was taken for,
+    checked with output_crc (the pending flag byte is left out, later tokens
+    fill it in).
+
+    to_bytes() / from_bytes() give a fixed-size binary record, and
+    pack_checkpoints() / unpack_checkpoints() a list of them, to store next
+    to a cached compressed block.
+    """
+    input_pos: int              # Input position of the next step
+    input_size: int             # Length of the input the checkpoint was taken on
+    verified_size: int          # Input bytes the decisions so far may have read
+    input_crc: int              # CRC-32 of input[:verified_size]
+    output_size: int
+    output_crc: int             # CRC-32 of the output so far, pending flag byte excluded
+    flag_byte_ptr: int
+    bit_accum: int
+    bit_counter: int
+    prev_token_pos: int         # None before the first match
+    prev_was_match: bool
+    scenario1_count: int
+    level: str
+    profile: str
+    max_match_length: int
+
+    _STRUCT = struct.Struct('<4sB8s8sIQQQIQIQHBqBQ')
+    _MAGIC = b'LZCK'
+    _VERSION = 1
+
+    def matches(self, data):
+        """True if compressing data makes the same decisions up to input_pos"""
+        view = byte_view(data)
+        if len(view) < self.verified_size:
+            return False
+        if self.verified_size == self.input_size and len(view) != self.input_size:
+            # The decisions saw the end of the input
+            return False
+        return zlib.crc32(view[:self.verified_size]) == self.input_crc
+
+    def to_bytes(self):
+        prev_token_pos = -1 if self.prev_token_pos is None else self.prev_token_pos
+        return self._STRUCT.pack(
+            self._MAGIC, self._VERSION, self.level.encode('ascii'), self.profile.encode('ascii'),
+            self.max_match_length, self.input_pos, self.input_size, self.verified_size,
+            self.input_crc, self.output_size, self.output_crc, self.flag_byte_ptr,
+            self.bit_accum, self.bit_counter, prev_token_pos, self.prev_was_match,
+            self.scenario1_count)
+
+    @classmethod
+    def from_bytes(cls, data):
+        (magic, version, level, profile, max_match_length, input_pos, input_size,
+         verified_size, input_crc, output_size, output_crc, flag_byte_ptr, bit_accum,
+         bit_counter, prev_token_pos, prev_was_match, scenario1_count) = cls._STRUCT.unpack(data)
+        if magic != cls._MAGIC or version != cls._VERSION:
+            raise ValueError(f"Not a version {cls._VERSION} compressor checkpoint")
+        return cls(input_pos=input_pos, input_size=input_size, verified_size=verified_size,
+                   input_crc=input_crc, output_size=output_size, output_crc=output_crc,
+                   flag_byte_ptr=flag_byte_ptr, bit_accum=bit_accum, bit_counter=bit_counter,
+                   prev_token_pos=None if prev_token_pos < 0 else prev_token_pos,
+                   prev_was_match=bool(prev_was_match), scenario1_count=scenario1_count,
+                   level=level.rstrip(b'\0').decode('ascii'),
+                   profile=profile.rstrip(b'\0').decode('ascii'),
+                   max_match_length=max_match_length)
+
+
+def output_crc(buffer, size, flag_byte_ptr, bit_counter):
+    """CRC-32 of buffer[:size] without the flag byte still being filled"""
+    view = memoryview(buffer)
+    if bit_counter == 0:
+        return zlib.crc32(view[:size])
+    return zlib.crc32(view[flag_byte_ptr + 1:size], zlib.crc32(view[:flag_byte_ptr]))
+
+
+def pack_checkpoints(checkpoints):
+    """Serialize a list of CompressorCheckpoints"""
+    return b''.join(checkpoint.to_bytes() for checkpoint in checkpoints)
+
+
+def unpack_checkpoints(data):
+    """Read back a pack_checkpoints() blob"""
+    record = CompressorCheckpoint._STRUCT.size
+    if len(data) % record:
+        raise ValueError(f"Checkpoint data is {len(data)} bytes, not a multiple of {record}")
+    return [CompressorCheckpoint.from_bytes(data[i:i + record])
+            for i in range(0, len(data), record)]
+
+
+class LZSSCompressor:
+    """
+    Game-exact lazy-matching compressor state for one input.
+
+    compress_lzss_lazy() is a thin wrapper around this class. Keeping the
+    loop state (position, output stream, previous match token) on an object
+    lets callers run the compressor a token at a time, resume it part way
+    through, or replay already known tokens with emit_literal() /
+    emit_match() before continuing with step().
+
+    level 'greedy' and 'balanced' replace the game's decision logic with a
+    simpler one (see step_fast) and always use a depth-limited hash chain
+    finder, so engine is ignored for them.
+
+    profile selects the encoder variant ('sav' or 'options', see
+    LZSSProfile). max_match_length overrides the profile's limit.
+
+    data can be any buffer (bytes, bytearray, memoryview, mmap); it is
+    copied once, into buffered_data, which the match finder shares.
+
+    stats is an optional CompressionStats to count into. progress(done, total)
+    is called and cancel (a CancellationToken) checked every PROGRESS_INTERVAL
+    input bytes of run().
+    """
+
+    def __init__(self, data, engine=DEFAULT_MATCH_ENGINE, memo=True, trace=False,
+                 window_start=2, level=DEFAULT_COMPRESSION_LEVEL, max_match_length=None,
+                 profile=DEFAULT_PROFILE, stats=None, progress=None, cancel=None):
+        setup_start = time.perf_counter()
+        self.profile = get_profile(profile)
+        if max_match_length is None:
+            max_match_length = self.profile.max_match_length
+
+        if level == 'optimal':
+            raise ValueError("Level 'optimal' parses the whole input up front, "
+                             "use compress_lzss_optimal()")
+        if level not in COMPRESSION_LEVELS:
+            raise ValueError(f"Unknown compression level: {level!r} "
+                             f"(expected one of {', '.join(COMPRESSION_LEVELS)})")
+
+        # Add 2-byte zero prefix (the one copy of the input)
+        self.buffered_data = prefixed_buffer(data)
+        self.engine = engine
+        self.level = level
+        self.max_match_length = max_match_length
+
+        if level != 'exact':
+            # Keep long match offsets encodable (8192 would wrap to 0)
+            finder = HashChainMatchFinder(self.buffered_data, max_match_length,
+                                          start=window_start,
+                                          max_chain=LEVEL_CHAIN_LIMITS[level],
+                                          window_size=MAX_LONG_OFFSET)
+            # Greedy never asks for the same position twice
+            memo = memo and level == 'balanced'
+        elif engine == 'hashchain':
+            # Positions before window_start are never offered as candidates
+            finder = HashChainMatchFinder(self.buffered_data, max_match_length,
+                                          start=window_start)
+        else:
+            finder = create_match_finder(self.buffered_data, engine, max_match_length)
+        if stats is not None and isinstance(finder, (HashChainMatchFinder, BruteForceMatchFinder)):
+            finder.stats = stats
+        self.memo = None
+        if memo and engine != 'table':
+            # The table engine already answers in O(1)
+            finder = self.memo = MatchMemo(finder, len(self.buffered_data))
+        if stats is not None:
+            finder = TimedMatchFinder(finder, stats)
+        self.finder = finder
+
+        self.output = BitWriter(BitWriter.worst_case_size(len(self.buffered_data) - 2))
+        self.trace = DecisionTrace() if trace else None
+        self.scenario1_count = 0
+
+        # Track previous match token position for Scenario 1
+        # This is the position of byte1 (first byte) of the previous long match,
+        # or the offset byte of the previous short match
+        self.prev_token_pos = None
+        self.prev_was_match = False
+
+        # Start at position 2 (after 2-byte prefix)
+        self.pos = 2
+
+        self.progress = progress
+        self.cancel = cancel
+
+        self.stats = stats
+        if stats is not None:
+            stats.add_time('setup', time.perf_counter() - setup_start)
+
+    def emit_literal(self, byte_val):
+        """Encode one literal at the current position"""
+        if self.trace is not None:
+            self.trace.add_literal(byte_val)
+
+        self.output.write_bits(0, 1)
+        self.output.write_byte(byte_val)
+        if self.stats is not None:
+            self.stats.literals += 1
+
+        # Literals don't count as "previous token" for Scenario 1
+        # Note: We keep prev_token_pos but clear prev_was_match
+        # This matches game behavior where only match tokens are tracked
+        self.prev_was_match = False
+        self.pos += 1
+
+    def emit_match(self, length, offset):
+        """Encode one match at the current position"""
+        if self.trace is not None:
+            self.trace.add_match(length, offset)
+
+        output = self.output
+        if 2 <= length <= 5 and offset <= self.profile.short_max_offset:
+            # Short match: flag 1, type 0, 2 length bits
+            output.write_bits(0b01 | ((length - 2) << 2), 4)
+
+            # Track token position for Scenario 1 (offset byte for short matches)
+            self.prev_token_pos = output.size
+            output.write_byte(offset - 1)
+            if self.stats is not None:
+                self.stats.short_matches += 1
+        else:
+            # Long match: flag 1, type 1
+            # NOTE: Long match encoding uses raw offset directly (no -1 like short matches)
+            # because the decoder doesn't add +1 for long matches
+            output.write_bits(0b11, 2)
+
+            # Track token position for Scenario 1 (byte1 for long matches)
+            self.prev_token_pos = output.size
+
+            if length < 10:
+                byte1 = ((length - 2) << 5) | (offset & 0x1F)
+                byte2 = (offset >> 5) & 0xFF
+                output.write_byte(byte1)
+                output.write_byte(byte2)
+            else:
+                byte1 = offset & 0x1F
+                byte2 = (offset >> 5) & 0xFF
+                output.write_byte(byte1)
+                output.write_byte(byte2)
+
+                remaining = length - 9
+                while remaining >= 0xFF:
+                    output.write_byte(0)
+                    remaining -= 0xFF
+                output.write_byte(remaining)
+            if self.stats is not None:
+                self.stats.long_matches += 1
+
+        self.prev_was_match = True
+        self.pos += length
+
+    def checkpoint(self):
+        """Snapshot the state between two steps as a CompressorCheckpoint"""
+        data = memoryview(self.buffered_data)[2:]
+        reach = max(DECISION_REACH, 512 + self.max_match_length)
+        verified_size = min(len(data), self.pos - 2 + reach)
+        output = self.output
+        return CompressorCheckpoint(
+            input_pos=self.pos - 2, input_size=len(data), verified_size=verified_size,
+            input_crc=zlib.crc32(data[:verified_size]), output_size=output.size,
+            output_crc=output_crc(output.buffer, output.size, output.flag_byte_ptr,
+                                  output.bit_counter),
+            flag_byte_ptr=output.flag_byte_ptr, bit_accum=output.bit_accum,
+            bit_counter=output.bit_counter, prev_token_pos=self.prev_token_pos,
+            prev_was_match=self.prev_was_match, scenario1_count=self.scenario1_count,
+            level=self.level, profile=self.profile.name, max_match_length=self.max_match_length)
+
+    @classmethod
+    def from_checkpoint(cls, data, compressed, checkpoint, engine=DEFAULT_MATCH_ENGINE, memo=True):
+        """
+        Compressor for data positioned at checkpoint, with the output up to
+        there taken from compressed (the stream the checkpoint was taken for).
+        Continuing with run() / finish() gives the same bytes as compressing
+        data from the start.
+        """
+        if not checkpoint.matches(data):
+            raise ValueError(f"Input differs from the checkpoint's before byte "
+                             f"{checkpoint.verified_size}")
+        if (len(compressed) < checkpoint.output_size or
+                output_crc(compressed, checkpoint.output_size, checkpoint.flag_byte_ptr,
+                           checkpoint.bit_counter) != checkpoint.output_crc):
+            raise ValueError("Compressed stream does not belong to the checkpoint")
+
+        compressor = cls(data, engine=engine, memo=memo,
+                         window_start=checkpoint.input_pos + 2 - WINDOW_SIZE,
+                         level=checkpoint.level, max_match_length=checkpoint.max_match_length,
+                         profile=checkpoint.profile)
+        output = compressor.output
+        output.buffer[:checkpoint.output_size] = compressed[:checkpoint.output_size]
+        output.size = checkpoint.output_size
+        output.flag_byte_ptr = checkpoint.flag_byte_ptr
+        output.bit_accum = checkpoint.bit_accum
+        output.bit_counter = checkpoint.bit_counter
+        compressor.pos = checkpoint.input_pos + 2
+        compressor.prev_token_pos = checkpoint.prev_token_pos
+        compressor.prev_was_match = checkpoint.prev_was_match
+        compressor.scenario1_count = checkpoint.scenario1_count
+        return compressor
+
+    def run_checkpointed(self, interval=CHECKPOINT_INTERVAL):
+        """
+        run() to the end of the input, taking a checkpoint at the first step
+        boundary after every multiple of interval input bytes. A compressor
+        at the start of the input also records one at input_pos 0, so even
+        inputs shorter than interval get a checkpoint (and with it the level,
+        profile and match length limit to recompress with).
+
+        Returns:
+            list of CompressorCheckpoint
+        """
+        checkpoints = [self.checkpoint()] if self.pos == 2 else []
+        end = len(self.buffered_data)
+        while True:
+            mark = ((self.pos - 2) // interval + 1) * interval
+            self.run(min(mark + 2, end))
+            if self.pos >= end:
+                return checkpoints
+            checkpoints.append(self.checkpoint())
+
+    def scenario1_armed(self):
+        """
+        True if Scenario 1 can fire at the next step (previous token is a
+        match whose byte has bottom 2 bits == 0). Together with the position
+        this is all the state a decision depends on.
+        """
+        return (self.level == 'exact' and self.profile.scenario1 and self.prev_was_match and
+                self.prev_token_pos is not None and
+                (self.output[self.prev_token_pos] & 0x03) == 0)
+
+    def step(self):
+        """Make the next encoding decision (one match, one literal, or 3 Scenario 1 literals)"""
+        if self.level != 'exact':
+            self.step_fast()
+            return
+
+        buffered_data = self.buffered_data
+        finder = self.finder
+        profile = self.profile
+        short_max_offset = profile.short_max_offset
+        stats = self.stats
+        pos = self.pos
 
-    while pos < len(buffered_data):
         # Find best match at current position
-        curr_length, curr_offset = find_best_match(buffered_data, pos)
-        
+        curr_length, curr_offset = finder.find(pos)
+
         # Force literal at the very first position (game behavior)
         if pos == 2:
             curr_length = 0
-        
-        # LAZY MATCHING with exact game logic  
+
+        # LAZY MATCHING with exact game logic
         if curr_length >= 2 and pos + 1 < len(buffered_data):
-            next_length, next_offset = find_best_match(buffered_data, pos + 1)
-            
+            next_length, next_offset = finder.find(pos + 1)
+
             # Determine match types
-            curr_is_short = (2 <= curr_length <= 5 and curr_offset <= 256)
-            next_is_short = (2 <= next_length <= 5 and next_offset <= 256)
-            
+            curr_is_short = (2 <= curr_length <= 5 and curr_offset <= short_max_offset)
+            next_is_short = (2 <= next_length <= 5 and next_offset <= short_max_offset)
+
             # Calculate adjustment (from decompiled code logic)
             if curr_is_short:
                 adjustment = 2
             else:
                 adjustment = 1
-            
+
             # Adjust based on transition between short/long matches
             if curr_is_short and not next_is_short and next_length >= 2:
                 adjustment += 2  # local_10 = 2
@@ -303,19 +1678,26 @@ def compress_lzss_lazy(data):
             # Compare: if next_length >= curr_length + adjustment, use literal (lazy)
             if next_length >= curr_length + adjustment:
                 curr_length = 0  # Force literal
-        
+                if stats is not None:
+                    stats.lazy_rejections += 1
+
         if curr_length >= 2:
             # Check if match is worth encoding (vs literal)
-            match_cost = calculate_match_cost(curr_length, curr_offset)
+            match_cost = calculate_match_cost(curr_length, curr_offset, short_max_offset)
             literal_cost = 9 * curr_length  # 1 flag bit + 8 data bits per byte
 
             if match_cost >= literal_cost:
                 # Match is not beneficial, use literal (prefer literals when costs equal)
                 curr_length = 0
+                if stats is not None:
+                    stats.cost_rejections += 1
 
-        if curr_length >= 2:
+        if curr_length >= 2 and profile.truncation:
             # Optimize long matches by checking for better opportunities ahead
-            curr_length = find_optimal_match_length(buffered_data, pos, curr_length, curr_offset)
+            length = find_optimal_match_length(buffered_data, pos, curr_length, curr_offset, finder)
+            if length < curr_length and stats is not None:
+                stats.truncations += 1
+            curr_length = length
 
         # ===== SCENARIO 1: Match-Follow-Match Optimization =====
         # Conditions from handoff document:
@@ -330,123 +1712,1241 @@ def compress_lzss_lazy(data):
         # We skip the bit modification since it corrupts the previous match offset.
         # The key optimization is converting 3-byte match to 3 literals when
         # surrounded by other matches, which can improve subsequent compression.
-        scenario1_applied = False
-        if curr_length == 3 and prev_was_match and prev_token_pos is not None:
+        if (profile.scenario1 and curr_length == 3 and self.prev_was_match and
+                self.prev_token_pos is not None):
             # Check if previous token has bottom 2 bits == 0
-            if (output[prev_token_pos] & 0x03) == 0:
+            if (self.output[self.prev_token_pos] & 0x03) == 0:
                 # Peek ahead to see if next decision will be a match
-                next_is_match, _, _ = peek_next_decision(buffered_data, pos, curr_length)
+                next_is_match, _, _ = peek_next_decision(buffered_data, pos, curr_length, finder)
                 if next_is_match:
                     # Apply Scenario 1 optimization
                     # Note: We do NOT modify prev_token_pos bits as this corrupts the offset
-                    scenario1_applied = True
-                    scenario1_counter += 1
+                    self.scenario1_count += 1
+                    if stats is not None:
+                        stats.scenario1 += 1
 
                     # Encode all 3 bytes as literals (NOT just the first one)
+                    # (emit_literal clears prev_was_match since we emitted literals)
                     for i in range(3):
-                        byte_val = buffered_data[pos + i]
-                        decisions.append(('L', byte_val))
-                        output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                            output, bit_accum, bit_counter, flag_byte_ptr, 0
-                        )
-                        output.append(byte_val)
-
-                    # Clear prev_was_match since we emitted literals
-                    prev_was_match = False
-                    pos += 3
-                    continue  # Skip normal encoding
+                        self.emit_literal(buffered_data[pos + i])
+                    return
 
         if curr_length >= 2:
-            # Encode match
-            decisions.append(('M', curr_length, curr_offset))
-            
-            # Flag bit 1
-            output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                output, bit_accum, bit_counter, flag_byte_ptr, 1
-            )
-            
-            if 2 <= curr_length <= 5 and curr_offset <= 256:
-                # Short match
-                output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                    output, bit_accum, bit_counter, flag_byte_ptr, 0
-                )
-
-                len_bits = curr_length - 2
-                for i in range(2):
-                    output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                        output, bit_accum, bit_counter, flag_byte_ptr, (len_bits >> i) & 1
-                    )
-
-                # Track token position for Scenario 1 (offset byte for short matches)
-                prev_token_pos = len(output)
-                output.append((curr_offset - 1) & 0xFF)
-                prev_was_match = True
+            self.emit_match(curr_length, curr_offset)
+        else:
+            self.emit_literal(buffered_data[pos])
+
+    def step_fast(self):
+        """
+        Encoding decision for the non-exact levels.
+
+        greedy: take the match found at the current position (single probe).
+        balanced: like greedy, but emit a literal first if the match starting
+        at the next position is longer (one step of lazy matching).
+
+        Both keep the cost check, so a match is only used when it is smaller
+        than the literals it replaces (this also rules out 2-byte long
+        matches, whose length field would read as the extension marker).
+        """
+        pos = self.pos
+        curr_length, curr_offset = self.finder.find(pos)
+        curr_length = encodable_match_length(curr_length)
+
+        stats = self.stats
+        if curr_length >= 2 and self.level == 'balanced' and pos + 1 < len(self.buffered_data):
+            next_length, _ = self.finder.find(pos + 1)
+            if next_length > curr_length:
+                curr_length = 0
+                if stats is not None:
+                    stats.lazy_rejections += 1
+
+        if curr_length >= 2:
+            if calculate_match_cost(curr_length, curr_offset, self.profile.short_max_offset) < 9 * curr_length:
+                self.emit_match(curr_length, curr_offset)
+                return
+            if stats is not None:
+                stats.cost_rejections += 1
+        self.emit_literal(self.buffered_data[pos])
+
+    def run(self, end=None):
+        """Compress from the current position up to end (default: end of the input)"""
+        if end is None:
+            end = len(self.buffered_data)
+        if self.progress is None and self.cancel is None:
+            self._run(end)
+            return
+
+        if self.cancel is not None:
+            self.cancel.check()
+        while self.pos < end:
+            self._run(min(self.pos + PROGRESS_INTERVAL, end))
+            self.report()
+
+    def report(self):
+        """Call the progress callback, then raise if cancelled"""
+        if self.progress is not None:
+            self.progress(self.pos - 2, len(self.buffered_data) - 2)
+        if self.cancel is not None:
+            self.cancel.check()
+
+    def _run(self, end):
+        step = self.step
+        stats = self.stats
+        if stats is None:
+            while self.pos < end:
+                step()
+            return
+
+        start = time.perf_counter()
+        search_before = stats.times.get('search', 0.0)
+        hits_before = self.memo.hits if self.memo is not None else 0
+        while self.pos < end:
+            step()
+        elapsed = time.perf_counter() - start
+        stats.add_time('encode', elapsed - (stats.times.get('search', 0.0) - search_before))
+        if self.memo is not None:
+            stats.memo_hits += self.memo.hits - hits_before
+
+    def finish(self):
+        """Write the terminator and return the compressed bytes"""
+        start = time.perf_counter()
+
+        # Terminator
+        self.output.write_bits(0b11, 2)
+        self.output.write_byte(0x20)
+        self.output.write_byte(0x00)
+
+        # Flush final bits
+        compressed = self.output.getvalue()
+        if self.stats is not None:
+            self.stats.add_time('finish', time.perf_counter() - start)
+        return compressed
+
+
+def compress_lzss_lazy(data, engine=DEFAULT_MATCH_ENGINE, memo=True, trace=False,
+                       level=DEFAULT_COMPRESSION_LEVEL, max_match_length=None,
+                       profile=DEFAULT_PROFILE, stats=None, progress=None, cancel=None):
+    """
+    Compress using lazy matching (lookahead optimization).
+    Uses 2-byte zero prefix - input starts at buffer position 2.
+
+    engine selects the match finder ('hashchain', 'table' or the 'brute'
+    reference scan, see create_match_finder). Output is identical for all.
+    With memo=True (default) each position is searched at most once; the
+    hit/miss counts are left in match_memo_stats.
+
+    With trace=True the token sequence is recorded in a DecisionTrace and
+    returned as the second tuple item; otherwise that item is None.
+
+    level trades the byte-exact game output for speed. Every level writes a
+    valid stream that LZSSDecompressor (and the game) decode to the same data:
+      - 'exact' (default): the game's decisions, byte-identical output
+      - 'balanced': 16-candidate hash chain + one step of lazy matching
+      - 'greedy': single hash probe, first match found is taken
+      - 'optimal': minimum-size token sequence (see compress_lzss_optimal)
+    Measured on the reference SAV (blocks 2 and 4, 32 KB each, see
+    lzss_benchmark.py --levels):
+      - balanced: ~7x faster than exact, output ~8% larger
+      - greedy: ~7x faster, output 12% larger on block 2 but 68% on
+        block 4, whose repeated inventory records defeat a single probe
+      - optimal: ~3x slower than exact, output 1.7% smaller
+
+    profile selects the game encoder variant: 'sav' (default) for SAV blocks,
+    'options' for OPTIONS sections (see LZSSProfile). max_match_length
+    overrides the profile's limit (2048 / 263).
+
+    data can be any buffer (bytes, bytearray, memoryview, mmap); there is
+    no need to convert it to bytes first.
+
+    For input that arrives in pieces, StreamingLZSSCompressor produces the
+    same output without holding the whole input or output in memory.
+
+    Pass a CompressionStats as stats to collect match finder counters,
+    decision counters and per-phase timings (lzss_compressor_final.py
+    --profile prints them). The output is the same either way.
+
+    progress(done, total) is called every PROGRESS_INTERVAL input bytes with
+    the bytes compressed so far and len(data). cancel is a CancellationToken
+    checked just as often; once it is cancelled (or its timeout has passed)
+    CompressionCancelled is raised.
+
+    Implements Scenario 1 tiebreaking optimization:
+    - When current match is exactly 3 bytes (length-2 == 1)
+    - And previous token exists with bottom 2 bits == 0
+    - And next decision will be a match (token >= 0x10)
+    - Then: set prev token's bits to 3, encode current as 3 literals
+    (SAV profile only)
+
+    Returns:
+        tuple: (compressed_bytes, decision_trace_or_None, scenario1_count)
+    """
+    global scenario1_counter
+
+    if level == 'optimal':
+        start = time.perf_counter()
+        compressed, decisions = compress_lzss_optimal(data, max_match_length, trace, profile,
+                                                      progress=progress, cancel=cancel)
+        if stats is not None:
+            stats.add_time('optimal', time.perf_counter() - start)
+            stats.input_size += len(byte_view(data))
+            stats.output_size += len(compressed)
+        scenario1_counter = 0
+        _record_memo_stats(None)
+        return compressed, decisions, scenario1_counter
+
+    compressor = LZSSCompressor(data, engine=engine, memo=memo, trace=trace,
+                                level=level, max_match_length=max_match_length,
+                                profile=profile, stats=stats, progress=progress, cancel=cancel)
+    compressor.run()
+    compressed = compressor.finish()
+    if stats is not None:
+        stats.input_size += len(compressor.buffered_data) - 2
+        stats.output_size += len(compressed)
+
+    scenario1_counter = compressor.scenario1_count
+    _record_memo_stats(compressor.finder)
+
+    return compressed, compressor.trace, scenario1_counter
+
+
+class StreamingLZSSCompressor:
+    """
+    Incremental version of compress_lzss_lazy() for input that arrives in pieces.
+
+        stream = StreamingLZSSCompressor()
+        for chunk in chunks:
+            out.write(stream.feed(chunk))
+        out.write(stream.flush())
+
+    The concatenated output is identical to compress_lzss_lazy(b''.join(chunks))
+    for any chunking, but only a bounded buffer is held: the 8192-byte window
+    behind the current position, up to STREAM_SEGMENT_SIZE bytes waiting to
+    be compressed, and DECISION_REACH bytes of lookahead.
+
+    A decision is only made once DECISION_REACH bytes past its position have
+    been fed (or flush() says the input has ended), so it sees exactly the
+    bytes the one-shot compressor would. Each pass runs an LZSSCompressor on
+    the buffered bytes, continuing the same BitWriter and Scenario 1 state;
+    the first WINDOW_SIZE bytes of the buffer are history only, and the zero
+    prefix in front of them is outside every window, as in the one-shot case.
+
+    Output is returned up to the current flag byte, whose bits are still
+    being filled. Level 'optimal' needs the whole input and is not supported.
+
+    progress(done, total) reports the input bytes compressed out of those fed
+    so far; cancel is a CancellationToken (see compress_lzss_lazy).
+    """
+
+    def __init__(self, engine=DEFAULT_MATCH_ENGINE, memo=True,
+                 level=DEFAULT_COMPRESSION_LEVEL, max_match_length=None,
+                 profile=DEFAULT_PROFILE, stats=None, progress=None, cancel=None):
+        if level == 'optimal':
+            raise ValueError("Level 'optimal' parses the whole input up front, "
+                             "use compress_lzss_optimal()")
+        if level not in COMPRESSION_LEVELS:
+            raise ValueError(f"Unknown compression level: {level!r} "
+                             f"(expected one of {', '.join(COMPRESSION_LEVELS)})")
+
+        self.profile = get_profile(profile)
+        if max_match_length is None:
+            max_match_length = self.profile.max_match_length
+        self.engine = engine
+        self.memo = memo
+        self.level = level
+        self.max_match_length = max_match_length
+        self.stats = stats
+        self.progress = progress
+        self.cancel = cancel
+        self.reach = max(DECISION_REACH, 512 + max_match_length)
+        self.limit = WINDOW_SIZE + STREAM_SEGMENT_SIZE + self.reach
+
+        # Input bytes from the start of the window, and the input position
+        # of the next decision relative to them
+        self.pending = bytearray()
+        self.pos = 0
+        # Input bytes dropped from the front of pending
+        self.dropped = 0
+
+        # Output not yet returned starts at self.emitted; bytes from
+        # prev_token_pos on are kept for the Scenario 1 check
+        self.output = BitWriter()
+        self.emitted = 0
+        self.prev_token_pos = None
+        self.prev_was_match = False
+
+        self.input_size = 0
+        self.output_size = 0
+        self.scenario1_count = 0
+        self.finished = False
+
+    def feed(self, chunk):
+        """Add input bytes, returning the compressed bytes that are now final"""
+        if self.finished:
+            raise ValueError("Compressor already flushed")
+
+        view = byte_view(chunk)
+        self.input_size += len(view)
+        parts = []
+        while len(view):
+            room = self.limit - len(self.pending)
+            self.pending += view[:room]
+            view = view[room:]
+            if len(self.pending) >= self.limit:
+                self._compress(final=False)
+                parts.append(self._drain())
+        return b''.join(parts)
+
+    def flush(self):
+        """Compress the rest of the input and write the terminator"""
+        if self.finished:
+            raise ValueError("Compressor already flushed")
+        self.finished = True
+
+        compressor = self._compress(final=True)
+        compressed = compressor.finish()[self.emitted:]
+        self.output_size += len(compressed)
+        self.pending = bytearray()
+        if self.stats is not None:
+            self.stats.input_size += self.input_size
+            self.stats.output_size += self.output_size
+        return compressed
+
+    def _compress(self, final):
+        """Run the compressor over the buffer, as far as the lookahead allows"""
+        compressor = LZSSCompressor(self.pending, engine=self.engine, memo=self.memo,
+                                    window_start=self.pos + 2 - WINDOW_SIZE,
+                                    level=self.level, max_match_length=self.max_match_length,
+                                    profile=self.profile, stats=self.stats, cancel=self.cancel)
+        if self.progress is not None:
+            def progress(done, total):
+                self.progress(self.dropped + done, self.input_size)
+            compressor.progress = progress
+        compressor.output = self.output
+        compressor.pos = self.pos + 2
+        compressor.prev_token_pos = self.prev_token_pos
+        compressor.prev_was_match = self.prev_was_match
+        compressor.scenario1_count = self.scenario1_count
+
+        end = len(compressor.buffered_data)
+        if not final:
+            end -= self.reach
+        compressor.run(end)
+
+        self.prev_token_pos = compressor.prev_token_pos
+        self.prev_was_match = compressor.prev_was_match
+        self.scenario1_count = compressor.scenario1_count
+
+        # Keep only the window behind the next decision
+        pos = compressor.pos - 2
+        drop = pos - WINDOW_SIZE
+        if drop > 0:
+            del self.pending[:drop]
+            self.dropped += drop
+            pos -= drop
+        self.pos = pos
+        return compressor
+
+    def _drain(self):
+        """Return the finished output bytes and drop the ones no longer needed"""
+        output = self.output
+        ready = output.flag_byte_ptr if output.bit_counter else output.size
+        compressed = bytes(output.buffer[self.emitted:ready])
+        self.output_size += len(compressed)
+
+        keep = ready
+        if self.prev_token_pos is not None and self.prev_token_pos < keep:
+            keep = self.prev_token_pos
+        del output.buffer[:keep]
+        output.size -= keep
+        output.flag_byte_ptr = max(0, output.flag_byte_ptr - keep)
+        if self.prev_token_pos is not None:
+            self.prev_token_pos -= keep
+        self.emitted = ready - keep
+        return compressed
+
+
+def optimal_parse(buffered_data, max_match_length=2048, short_max_offset=256,
+                  progress=None, cancel=None):
+    """
+    Minimum-size token sequence for buffered data (2-byte prefix included).
+
+    Dynamic programming from the end of the input: cost[pos] is the fewest
+    bits that can encode buffered_data[pos:], using the same bit costs as the
+    encoder (9 per literal, calculate_match_cost() per match). At each
+    position the candidates are:
+      - a literal
+      - the longest short match (offset <= short_max_offset, length <= 5)
+      - for every cost class of long matches (3-9 bytes, then each number of
+        extension bytes), the longest length of that class the longest match
+        covers
+    Taking the longest length within a class is enough because cost[] never
+    grows towards the end of the input: a match can always be shortened from
+    the front by one byte without costing more.
+
+    Matches follow the game's window rules (no references into the prefix)
+    and only use offsets and lengths the decoder reads back unambiguously.
+
+    progress(done, total) counts positions parsed so far; cancel is checked
+    at the same points, and once more after the match table is built.
+
+    Returns:
+        list of (length, offset) tokens from position 2, with (1, 0) for a literal
+    """
+    size = len(buffered_data)
+    if cancel is not None:
+        cancel.check()
+    table = MatchTable(buffered_data, max_match_length)
+    if cancel is not None:
+        cancel.check()
+    tracked = progress is not None or cancel is not None
+    near = HashChainMatchFinder(buffered_data, 5, window_size=short_max_offset)
+    far = None
+
+    cost = [0] * (size + 1)
+    choice_length = [1] * size
+    choice_offset = [0] * size
+    lengths = table.lengths
+    offsets = table.offsets
+
+    for pos in range(size - 1, 1, -1):
+        best = 9 + cost[pos + 1]
+        best_length = 1
+        best_offset = 0
+
+        length = lengths[pos]
+        offset = offsets[pos]
+        if offset > MAX_LONG_OFFSET:
+            # An offset of 8192 would encode as the terminator
+            if far is None:
+                far = HashChainMatchFinder(buffered_data, max_match_length,
+                                           window_size=MAX_LONG_OFFSET)
+            length, offset = far.find(pos)
+
+        if length >= 2:
+            short_length, short_offset = near.find(pos)
+            if short_length >= 2:
+                total = 12 + cost[pos + short_length]
+                if total < best:
+                    best, best_length, best_offset = total, short_length, short_offset
+
+            # Long match cost classes: 3-9 bytes, then one more extension byte
+            # per class: 10-263, 265-518, ... (264, 519, ... cannot be encoded)
+            low, high = 3, 9
+            while length >= low:
+                candidate = min(length, high)
+                total = (calculate_match_cost(candidate, offset, short_max_offset) +
+                         cost[pos + candidate])
+                if total < best:
+                    best, best_length, best_offset = total, candidate, offset
+                low, high = (10, 263) if high == 9 else (high + 2, high + 255)
+
+        cost[pos] = best
+        choice_length[pos] = best_length
+        choice_offset[pos] = best_offset
+
+        if tracked and (pos - 2) % PROGRESS_INTERVAL == 0:
+            if progress is not None:
+                progress(size - pos, size - 2)
+            if cancel is not None:
+                cancel.check()
+
+    tokens = []
+    pos = 2
+    while pos < size:
+        length = choice_length[pos]
+        tokens.append((length, choice_offset[pos]))
+        pos += length
+    return tokens
+
+
+def compress_lzss_optimal(data, max_match_length=None, trace=False, profile=DEFAULT_PROFILE,
+                          progress=None, cancel=None):
+    """
+    Compress data to the smallest stream the LZSS format allows (see
+    optimal_parse). The output decodes to the same data but is not
+    byte-identical to the game's.
+
+    progress and cancel work as in compress_lzss_lazy().
+
+    Returns:
+        tuple: (compressed_bytes, decision_trace_or_None)
+    """
+    profile = get_profile(profile)
+    if max_match_length is None:
+        max_match_length = profile.max_match_length
+
+    compressor = LZSSCompressor(data, memo=False, trace=trace, profile=profile)
+    buffered_data = compressor.buffered_data
+    for length, offset in optimal_parse(buffered_data, max_match_length,
+                                        profile.short_max_offset, progress, cancel):
+        if length == 1:
+            compressor.emit_literal(buffered_data[compressor.pos])
+        else:
+            compressor.emit_match(length, offset)
+    return compressor.finish(), compressor.trace
+
+
+def recompress_delta(original_data, original_compressed, edited_data,
+                     engine=DEFAULT_MATCH_ENGINE, profile=DEFAULT_PROFILE,
+                     progress=None, cancel=None):
+    """
+    Recompress edited data, reusing the original token stream where possible.
+
+    Output is identical to compress_lzss_lazy(edited_data), but only the
+    stretch around the edit is actually recompressed:
+
+    1. Original tokens are replayed up to the last step boundary that is at
+       least DECISION_REACH bytes before the first changed byte (decisions
+       before it cannot have looked at the edit).
+    2. The game-exact compressor runs on the edited data from there.
+    3. Once the edit has left the 8192-byte window, whenever the compressor
+       stops on a position where the original stream also started a new
+       step with the same Scenario 1 state (previous token is a match with
+       the same low 2 bits), every remaining decision must be the same as
+       before, so the remaining original tokens are spliced back in.
+
+    Edits may change the data length; unchanged bytes are found by
+    comparing the common prefix and suffix.
+
+    Args:
+        original_data: Decompressed data before the edit
+        original_compressed: compress_lzss_lazy(original_data) output, e.g. the
+            untouched block read from a SAV file
+        edited_data: Data after the edit
+        engine: Match finder engine for the recompressed stretch
+        profile: Encoder profile the original stream was written with
+        progress: Optional progress(done, total) callback, called every
+            PROGRESS_INTERVAL input bytes of the recompressed stretch
+        cancel: Optional CancellationToken, checked just as often
+
+    Returns:
+        tuple: (compressed_bytes, stats) where stats is a dict with the restart
+               and resync input positions and token counts
+    """
+    original_data = byte_view(original_data)
+    edited_data = byte_view(edited_data)
+    tokens = list(LZSSDecompressor().iter_tokens(original_compressed))
+
+    # Buffered start position of every original token (2-byte prefix included)
+    starts = []
+    pos = 2
+    for token in tokens:
+        starts.append(pos)
+        pos += 1 if token[0] == 'L' else token[1]
+    if pos != len(original_data) + 2:
+        raise ValueError(f"Compressed stream covers {pos - 2} bytes, "
+                         f"original data has {len(original_data)}")
+
+    stats = {
+        'restart_pos': None,
+        'resync_pos': None,
+        'replayed_tokens': 0,
+        'spliced_tokens': 0,
+        'total_tokens': len(tokens),
+    }
+    if original_data == edited_data:
+        return bytes(original_compressed), stats
+
+    # Changed region: [edit_start, old_end) in the original, [edit_start, new_end) edited
+    common = min(len(original_data), len(edited_data))
+    edit_start = 0
+    while edit_start < common and original_data[edit_start] == edited_data[edit_start]:
+        edit_start += 1
+    suffix = 0
+    while (suffix < common - edit_start and
+           original_data[-1 - suffix] == edited_data[-1 - suffix]):
+        suffix += 1
+    new_end = len(edited_data) - suffix
+    shift = len(edited_data) - len(original_data)
+
+    # Restart point: a step boundary (start of data or right after a match)
+    # whose decisions cannot have read the edited bytes
+    restart = 0
+    for index in range(1, len(tokens)):
+        if starts[index] + DECISION_REACH > edit_start + 2:
+            break
+        if tokens[index - 1][0] == 'M':
+            restart = index
+
+    restart_pos = starts[restart] if restart < len(tokens) else 2
+    profile = get_profile(profile)
+    compressor = LZSSCompressor(edited_data, engine=engine,
+                                window_start=restart_pos - WINDOW_SIZE, profile=profile,
+                                progress=progress, cancel=cancel)
+    for token in tokens[:restart]:
+        if token[0] == 'L':
+            compressor.emit_literal(token[1])
+        else:
+            compressor.emit_match(token[1], token[2])
+
+    # Resync candidates (edited coordinates) -> (token index, Scenario 1 low bits)
+    resync_from = new_end + 2 + WINDOW_SIZE
+    resync = {}
+    for index in range(restart + 1, len(tokens)):
+        previous = tokens[index - 1]
+        if previous[0] == 'M' and starts[index] + shift >= resync_from:
+            if profile.is_short(previous[1], previous[2]):
+                low_bits = (previous[2] - 1) & 0x03
             else:
-                # Long match
-                # NOTE: Long match encoding uses raw offset directly (no -1 like short matches)
-                # because the decoder doesn't add +1 for long matches
-                output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                    output, bit_accum, bit_counter, flag_byte_ptr, 1
-                )
-
-                # Track token position for Scenario 1 (byte1 for long matches)
-                prev_token_pos = len(output)
-
-                if curr_length < 10:
-                    byte1 = ((curr_length - 2) << 5) | (curr_offset & 0x1F)
-                    byte2 = (curr_offset >> 5) & 0xFF
-                    output.append(byte1)
-                    output.append(byte2)
+                low_bits = previous[2] & 0x03
+            resync[starts[index] + shift] = (index, low_bits)
+
+    stats['restart_pos'] = restart_pos - 2
+    stats['replayed_tokens'] = restart
+
+    end = len(compressor.buffered_data)
+    tracked = progress is not None or cancel is not None
+    next_report = compressor.pos + PROGRESS_INTERVAL
+    while compressor.pos < end:
+        if tracked and compressor.pos >= next_report:
+            compressor.report()
+            next_report = compressor.pos + PROGRESS_INTERVAL
+        candidate = resync.get(compressor.pos)
+        if (candidate is not None and compressor.prev_was_match and
+                (compressor.output[compressor.prev_token_pos] & 0x03) == candidate[1]):
+            stats['resync_pos'] = compressor.pos - 2
+            stats['spliced_tokens'] = len(tokens) - candidate[0]
+            for token in tokens[candidate[0]:]:
+                if token[0] == 'L':
+                    compressor.emit_literal(token[1])
                 else:
-                    byte1 = curr_offset & 0x1F
-                    byte2 = (curr_offset >> 5) & 0xFF
-                    output.append(byte1)
-                    output.append(byte2)
-
-                    remaining = curr_length - 9
-                    while remaining >= 0xFF:
-                        output.append(0)
-                        remaining -= 0xFF
-                    output.append(remaining & 0xFF)
-                prev_was_match = True
-
-            pos += curr_length
+                    compressor.emit_match(token[1], token[2])
+            break
+        compressor.step()
+
+    if progress is not None:
+        progress(len(edited_data), len(edited_data))
+    return compressor.finish(), stats
+
+
+def token_size(length, offset, short_max_offset=256):
+    """
+    Flag bits and data bytes of one token as emit_literal() / emit_match()
+    write it (offset 0 = literal).
+
+    Returns:
+        tuple: (flag_bits, data_bytes)
+    """
+    if offset == 0:
+        return 1, 1
+    if 2 <= length <= 5 and offset <= short_max_offset:
+        return 4, 1
+    if length < 10:
+        return 2, 2
+    return 2, 3 + (length - 9) // 255
+
+
+@dataclass
+class SizeEstimate:
+    """
+    Result of SizeEstimator.estimate().
+
+    size is the predicted compressed size, original_size the size before the
+    edits. min_size / max_size bound what compress_lzss_lazy actually
+    produces (see SizeEstimator). first_token / last_token are the original
+    tokens the edits touch (directly, or as the source of a match), covering
+    input bytes [first_pos, end_pos); all None when no byte actually changes.
+    """
+    size: int
+    original_size: int
+    min_size: int = None
+    max_size: int = None
+    first_token: int = None
+    last_token: int = None
+    first_pos: int = None
+    end_pos: int = None
+
+    @property
+    def delta(self):
+        return self.size - self.original_size
+
+
+class SizeEstimator:
+    """
+    Predicts the compressed size of edited data from the original token
+    stream, without running the compressor.
+
+    The original stream is parsed once (estimate() can then be called for
+    any number of edit sets). For an edit set, every match that copies to or
+    from a changed byte is re-checked against the edited data and split
+    where it no longer matches: the pieces that still match keep the
+    match's offset, the rest become literals. All other tokens keep their
+    size. The real parse re-chooses tokens around each edit, so this is
+    done two ways:
+
+    - max_size splits wherever target and source now differ. That is the
+      size of a valid stream for the edited data, which the compressor
+      practically never does worse than; one byte of slack covers its
+      lazy parse.
+    - size splits only at a changed target byte that no longer matches its
+      source. A match whose source changed is counted as if the compressor
+      finds the same run elsewhere, which it usually does.
+
+    min_size allows each changed byte to save two bytes over the original
+    (a merged token). On fuzzed edits to the bundled save and options
+    sections (1 to 64 edits per set), compress_lzss_lazy stayed within
+    [min_size, max_size] every time; size had a median error of 0 and a
+    mean of about -3 bytes, with large misses (tens of bytes low) only
+    where many edits land on long repeated runs.
+
+    The original data is copied, so the caller may go on editing (or
+    resizing, or closing) its buffer. Only in-place edits (same data
+    length) are supported.
+    """
+
+    def __init__(self, original_data, original_compressed, profile=DEFAULT_PROFILE):
+        self.data = bytes(original_data)
+        self.profile = get_profile(profile)
+        self.original_size = len(original_compressed)
+
+        short_max_offset = self.profile.short_max_offset
+        self.starts = array('q')
+        self.lengths = array('H')
+        self.offsets = array('H')
+        # Terminator: 2 flag bits, 2 bytes
+        flag_bits = 2
+        data_bytes = 2
+        pos = 0
+        for token in LZSSDecompressor().iter_tokens(original_compressed):
+            if token[0] == 'L':
+                length, offset = 1, 0
+            else:
+                length, offset = token[1], token[2]
+            self.starts.append(pos)
+            self.lengths.append(length)
+            self.offsets.append(offset)
+            bits, size = token_size(length, offset, short_max_offset)
+            flag_bits += bits
+            data_bytes += size
+            pos += length
+        if pos != len(self.data):
+            raise ValueError(f"Compressed stream covers {pos} bytes, "
+                             f"original data has {len(self.data)}")
+        self.flag_bits = flag_bits
+        self.data_bytes = data_bytes
+
+    def _run_size(self, length, offset):
+        """Flag bits and data bytes of a still-matching piece of a split match"""
+        short_max_offset = self.profile.short_max_offset
+        if length >= 3 or (length == 2 and offset <= short_max_offset):
+            usable = encodable_match_length(length)
+            bits, size = token_size(usable, offset, short_max_offset)
+            bits += length - usable
+            size += length - usable
+            if bits + 8 * size < 9 * length:
+                return bits, size
+        return length, length
+
+    def estimate(self, edits):
+        """
+        Predict the compressed size after edits.
+
+        Args:
+            edits: {position: byte value} or an iterable of
+                   (position, replacement bytes) pairs
+
+        Returns:
+            SizeEstimate
+        """
+        data = self.data
+        changed = {}
+        items = edits.items() if isinstance(edits, dict) else edits
+        for position, value in items:
+            values = (value,) if isinstance(value, int) else byte_view(value)
+            if position < 0 or position + len(values) > len(data):
+                raise ValueError(f"Edit at {position} ({len(values)} bytes) is outside "
+                                 f"the {len(data)}-byte input")
+            for index, byte in enumerate(values):
+                if data[position + index] != byte:
+                    changed[position + index] = byte
+                else:
+                    changed.pop(position + index, None)
+        if not changed:
+            return SizeEstimate(self.original_size, self.original_size,
+                                min_size=self.original_size, max_size=self.original_size)
+
+        positions = sorted(changed)
+        starts = self.starts
+        lengths = self.lengths
+        offsets = self.offsets
+
+        def byte_at(index):
+            return changed.get(index, data[index])
+
+        # Tokens that write a changed byte, or copy one from up to
+        # MAX_LONG_OFFSET bytes back
+        affected = set()
+        scan_end = -1
+        for position in positions:
+            index = bisect_left(starts, position + 1) - 1
+            affected.add(index)
+            index = max(index + 1, scan_end)
+            stop = bisect_left(starts, position + MAX_LONG_OFFSET + 1)
+            for token in range(index, stop):
+                offset = offsets[token]
+                if offset:
+                    source = starts[token] - offset
+                    first = bisect_left(positions, source)
+                    if first < len(positions) and positions[first] < source + lengths[token]:
+                        affected.add(token)
+            scan_end = max(scan_end, stop)
+
+        # [flag bits, data bytes] for each split: where target and source
+        # differ (upper bound), and only where a changed target byte does
+        sizes = [self.flag_bits, self.data_bytes, self.flag_bits, self.data_bytes]
+        short_max_offset = self.profile.short_max_offset
+        for token in affected:
+            offset = offsets[token]
+            if not offset:
+                # A literal keeps its size whatever its value
+                continue
+            start = starts[token]
+            length = lengths[token]
+            bits, size = token_size(length, offset, short_max_offset)
+            for split in (0, 2):
+                sizes[split] -= bits
+                sizes[split + 1] -= size
+
+            runs = [0, 0]
+            for index in range(start, start + length):
+                source = byte_at(index - offset)
+                value = changed.get(index)
+                matches = ((data[index] if value is None else value) == source,
+                           value is None or value == source)
+                for split, run in enumerate(runs):
+                    if matches[split]:
+                        runs[split] = run + 1
+                        continue
+                    if run:
+                        bits, size = self._run_size(run, offset)
+                        sizes[2 * split] += bits
+                        sizes[2 * split + 1] += size
+                        runs[split] = 0
+                    sizes[2 * split] += 1
+                    sizes[2 * split + 1] += 1
+            for split, run in enumerate(runs):
+                if run:
+                    bits, size = self._run_size(run, offset)
+                    sizes[2 * split] += bits
+                    sizes[2 * split + 1] += size
+
+        max_size = sizes[1] + (sizes[0] + 7) // 8
+        size = sizes[3] + (sizes[2] + 7) // 8
+        first_token = min(affected)
+        last_token = max(affected)
+        return SizeEstimate(
+            size=size, original_size=self.original_size,
+            min_size=max(0, min(size, self.original_size - 2 * len(changed))),
+            max_size=max(size, max_size + 1),
+            first_token=first_token, last_token=last_token, first_pos=starts[first_token],
+            end_pos=starts[last_token] + lengths[last_token])
+
+
+def compress_lzss_checkpointed(data, interval=CHECKPOINT_INTERVAL, engine=DEFAULT_MATCH_ENGINE,
+                               memo=True, level=DEFAULT_COMPRESSION_LEVEL,
+                               max_match_length=None, profile=DEFAULT_PROFILE):
+    """
+    compress_lzss_lazy() that also returns a CompressorCheckpoint at the start
+    and about every interval input bytes, for recompress_from_checkpoint() to
+    resume from. Level 'optimal' is not supported.
+
+    Returns:
+        tuple: (compressed_bytes, checkpoints)
+    """
+    compressor = LZSSCompressor(data, engine=engine, memo=memo, level=level,
+                                max_match_length=max_match_length, profile=profile)
+    checkpoints = compressor.run_checkpointed(interval)
+    return compressor.finish(), checkpoints
+
+
+def recompress_from_checkpoint(data, compressed, checkpoints, interval=CHECKPOINT_INTERVAL,
+                               engine=DEFAULT_MATCH_ENGINE, memo=True):
+    """
+    Compress data, resuming from the latest checkpoint that still holds.
+
+    compressed and checkpoints come from compress_lzss_checkpointed() (or an
+    earlier call of this function) on an older version of data. A checkpoint
+    holds if data is unchanged up to its verified_size, so for data that only
+    grew or changed near the end almost everything before the change is
+    reused. Level, profile and match length limit are taken from the
+    checkpoints. Output is identical to compressing data from the start.
+
+    Returns:
+        tuple: (compressed_bytes, checkpoints, resume_pos) - the checkpoints
+               for data (reused ones plus new ones), and the input position
+               compression resumed from (0 if no checkpoint held)
+    """
+    if not checkpoints:
+        raise ValueError("No checkpoints to resume from")
+
+    # Prefix CRCs grow with verified_size, so one pass over data finds the
+    # last checkpoint that holds
+    view = byte_view(data)
+    usable = None
+    crc = 0
+    checked = 0
+    for index, checkpoint in enumerate(checkpoints):
+        if checkpoint.verified_size < checked or checkpoint.verified_size > len(view):
+            break
+        crc = zlib.crc32(view[checked:checkpoint.verified_size], crc)
+        checked = checkpoint.verified_size
+        if crc != checkpoint.input_crc:
+            break
+        if checkpoint.verified_size == checkpoint.input_size and len(view) != checkpoint.input_size:
+            # The decisions saw the end of the input
+            break
+        if checkpoint.input_pos:
+            # Resuming from input_pos 0 is a fresh run
+            usable = index
+
+    if usable is None:
+        first = checkpoints[0]
+        compressor = LZSSCompressor(data, engine=engine, memo=memo, level=first.level,
+                                    max_match_length=first.max_match_length,
+                                    profile=first.profile)
+        kept = []
+    else:
+        compressor = LZSSCompressor.from_checkpoint(data, compressed, checkpoints[usable],
+                                                    engine=engine, memo=memo)
+        # Still valid for data, whose length may differ
+        kept = [replace(checkpoint, input_size=len(view))
+                for checkpoint in checkpoints[:usable + 1]]
+    resume_pos = compressor.pos - 2
+
+    kept.extend(compressor.run_checkpointed(interval))
+    return compressor.finish(), kept, resume_pos
+
+
+@dataclass
+class CompressionMismatch:
+    """
+    First place where the compressor's output differs from a reference stream
+    (see verify_compression).
+
+    expected / actual are the reference and our byte at output_pos (None
+    where that stream has already ended). input_pos and token_index are the
+    position and token count at the start of the step that wrote the byte.
+    tokens and reference_tokens hold the decision trace around token_index,
+    ours and the reference's (decoded with LZSSDecompressor.iter_tokens),
+    starting at token first_token.
+    """
+    output_pos: int
+    input_pos: int
+    token_index: int
+    expected: int
+    actual: int
+    first_token: int
+    tokens: list
+    reference_tokens: list
+
+    def format_report(self):
+        """Human readable report with the two traces side by side"""
+        def byte(value):
+            return 'end of stream' if value is None else f"0x{value:02x}"
+
+        lines = [f"First difference at output byte {self.output_pos}: "
+                 f"ours={byte(self.actual)}, reference={byte(self.expected)}",
+                 f"Step at input position {self.input_pos}, token {self.token_index}",
+                 f"{'token':>7}  {'ours':<16}reference"]
+        for index in range(max(len(self.tokens), len(self.reference_tokens))):
+            cells = []
+            for tokens in (self.tokens, self.reference_tokens):
+                if index >= len(tokens):
+                    cells.append('-')
+                elif tokens[index][0] == 'L':
+                    cells.append(f"L:{tokens[index][1]:02x}")
+                else:
+                    cells.append(f"M:{tokens[index][1]},{tokens[index][2]}")
+            token = self.first_token + index
+            marker = '>' if token == self.token_index else ' '
+            lines.append(f"{marker}{token:>6}  {cells[0]:<16}{cells[1]}")
+        return '\n'.join(lines)
+
+
+def _first_difference(ours, reference, start, end):
+    """First index in [start, end) where the streams differ, or None"""
+    for index in range(start, end):
+        if index >= len(ours) or index >= len(reference) or ours[index] != reference[index]:
+            return index
+    return None
+
+
+def verify_compression(data, reference, engine=DEFAULT_MATCH_ENGINE, memo=True,
+                       level=DEFAULT_COMPRESSION_LEVEL, max_match_length=None,
+                       profile=DEFAULT_PROFILE, context=8):
+    """
+    Compress data while checking every output byte against reference, and
+    stop at the first one that differs.
+
+    Each byte is compared as soon as the step that writes it returns; the
+    flag bits of the flag byte still being filled are compared as they are
+    written. A wrong decision is therefore caught at that decision, without
+    compressing the rest of the input.
+
+    context is the number of tokens before and after the diverging step in
+    the reported traces. Level 'optimal' is not supported.
+
+    Returns:
+        CompressionMismatch, or None if the output equals reference
+    """
+    reference = byte_view(reference)
+    compressor = LZSSCompressor(data, engine=engine, memo=memo, trace=True, level=level,
+                                max_match_length=max_match_length, profile=profile)
+    output = compressor.output
+    buffer = output.buffer
+    trace = compressor.trace
+    end = len(compressor.buffered_data)
+
+    mismatch_pos = None
+    input_pos = end
+    token_index = None
+    checked = 0
+    while compressor.pos < end:
+        input_pos = compressor.pos
+        token_index = len(trace)
+        compressor.step()
+
+        size = output.size
+        if output.bit_counter:
+            flag = output.flag_byte_ptr
+            if buffer[checked:flag] != reference[checked:flag]:
+                mismatch_pos = _first_difference(buffer, reference, checked, flag)
+                break
+            mask = (1 << output.bit_counter) - 1
+            if flag >= len(reference) or (reference[flag] & mask) != (output.bit_accum & mask):
+                mismatch_pos = flag
+                break
+            if buffer[flag + 1:size] != reference[flag + 1:size]:
+                mismatch_pos = _first_difference(buffer, reference, flag + 1, size)
+                break
+            checked = flag
         else:
-            # Encode literal
-            byte_val = buffered_data[pos]
-            decisions.append(('L', byte_val))
+            if buffer[checked:size] != reference[checked:size]:
+                mismatch_pos = _first_difference(buffer, reference, checked, size)
+                break
+            checked = size
+
+    if mismatch_pos is None:
+        # Terminator, final flag bits and trailing bytes
+        compressed = compressor.finish()
+        if compressed == reference:
+            return None
+        input_pos = end
+        token_index = len(trace)
+        mismatch_pos = _first_difference(compressed, reference, checked,
+                                         max(len(compressed), len(reference)))
+        actual = compressed[mismatch_pos] if mismatch_pos < len(compressed) else None
+    elif mismatch_pos == output.flag_byte_ptr and output.bit_counter:
+        actual = output.bit_accum & ((1 << output.bit_counter) - 1)
+    else:
+        actual = buffer[mismatch_pos] if mismatch_pos < output.size else None
+
+    first_token = max(0, token_index - context)
+    # Our trace ends with the diverging step; continue it for the context after
+    while compressor.pos < end and len(trace) < token_index + context + 1:
+        compressor.step()
+    tokens = list(islice(trace, first_token, token_index + context + 1))
+    reference_tokens = list(islice(LZSSDecompressor().iter_tokens(reference),
+                                   first_token, token_index + context + 1))
+    return CompressionMismatch(
+        output_pos=mismatch_pos, input_pos=input_pos - 2, token_index=token_index,
+        expected=reference[mismatch_pos] if mismatch_pos < len(reference) else None,
+        actual=actual, first_token=first_token, tokens=tokens,
+        reference_tokens=reference_tokens)
+
+
+def _compress_segment(data, base, start, end, engine, memo, level, max_match_length, profile):
+    """
+    Speculatively compress one compress_lzss_parallel() segment (worker side).
 
-            output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                output, bit_accum, bit_counter, flag_byte_ptr, 0
-            )
-            output.append(byte_val)
+    data holds the input from position base: the window of history in front
+    of start, the segment [start, end), and the lookahead the decisions
+    before end can read. The compressor starts at start as if a step began
+    there with Scenario 1 not armed, and stops at the first step boundary at
+    or after end.
 
-            # Literals don't count as "previous token" for Scenario 1
-            # Note: We keep prev_token_pos but clear prev_was_match
-            # This matches game behavior where only match tokens are tracked
-            prev_was_match = False
+    Returns:
+        tuple: (positions, token_index, armed, scenario1, trace) - for every
+               step boundary its input position, the number of tokens before
+               it, whether Scenario 1 was armed and the Scenario 1 count so
+               far; trace holds the tokens
+    """
+    compressor = LZSSCompressor(data, engine=engine, memo=memo, trace=True,
+                                window_start=start - base + 2 - WINDOW_SIZE, level=level,
+                                max_match_length=max_match_length, profile=profile)
+    compressor.pos = start - base + 2
+    trace = compressor.trace
+    step = compressor.step
+    end += 2 - base
+
+    positions = array('q')
+    token_index = array('q')
+    armed = array('B')
+    scenario1 = array('q')
+    while True:
+        positions.append(compressor.pos - 2 + base)
+        token_index.append(len(trace))
+        armed.append(compressor.scenario1_armed())
+        scenario1.append(compressor.scenario1_count)
+        if compressor.pos >= end:
+            break
+        step()
+    return positions, token_index, armed, scenario1, trace
 
-            pos += 1
-    
-    # Terminator
-    output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-        output, bit_accum, bit_counter, flag_byte_ptr, 1
-    )
-    output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-        output, bit_accum, bit_counter, flag_byte_ptr, 1
-    )
-    
-    output.append(0x20)
-    output.append(0x00)
-    
-    # Flush final bits
-    if bit_counter > 0:
-        output[flag_byte_ptr] = ((1 << bit_counter) - 1) & bit_accum
 
-    return bytes(output), decisions, scenario1_counter
+def compress_lzss_parallel(data, workers=None, segment_size=None, engine=DEFAULT_MATCH_ENGINE,
+                           memo=True, trace=False, level=DEFAULT_COMPRESSION_LEVEL,
+                           max_match_length=None, profile=DEFAULT_PROFILE,
+                           progress=None, cancel=None):
+    """
+    compress_lzss_lazy() spread over a process pool, with identical output.
+
+    The input is split into segments (one per worker by default, at least
+    PARALLEL_MIN_SEGMENT_SIZE bytes). Each worker compresses its segment on
+    its own, with the preceding window as history, guessing that a step
+    starts at the segment start with Scenario 1 not armed. The result is a
+    speculation: the sequential parse may cross the boundary inside a match,
+    or arrive in a different Scenario 1 state.
+
+    The tokens are then stitched together in order. Every decision depends
+    only on its position and the Scenario 1 state (see scenario1_armed), so
+    once the sequential parse reaches a step boundary of the speculation in
+    the same state, the rest of the speculative tokens are exactly what the
+    sequential compressor would write. Until then the disagreeing stretch
+    is re-run sequentially, usually a token or two. Re-runs use the
+    'hashchain' engine, which gives the same output as the others, over a
+    short slice from the window behind the re-run, so their setup cost does
+    not grow with the input or the segment size.
+
+    workers defaults to os.cpu_count(). With one worker or a single
+    segment this is compress_lzss_lazy(). Segment and resync counts of the
+    last call are left in parallel_stats. progress and cancel are reported
+    and checked once per segment. Level 'optimal' is not supported.
+
+    Returns:
+        tuple: (compressed_bytes, decision_trace_or_None, scenario1_count)
+    """
+    global scenario1_counter
+
+    if level == 'optimal':
+        raise ValueError("Level 'optimal' parses the whole input up front, "
+                         "use compress_lzss_optimal()")
+    if level not in COMPRESSION_LEVELS:
+        raise ValueError(f"Unknown compression level: {level!r} "
+                         f"(expected one of {', '.join(COMPRESSION_LEVELS)})")
+    profile = get_profile(profile)
+    if max_match_length is None:
+        max_match_length = profile.max_match_length
+    if workers is None:
+        workers = os.cpu_count() or 1
+    view = byte_view(data)
+    size = len(view)
+    if segment_size is None:
+        segment_size = max(PARALLEL_MIN_SEGMENT_SIZE, -(-size // workers))
+
+    parallel_stats.update(segments=1, resyncs=0, rerun_bytes=0)
+    if workers <= 1 or size <= segment_size:
+        return compress_lzss_lazy(data, engine=engine, memo=memo, trace=trace, level=level,
+                                  max_match_length=max_match_length, profile=profile,
+                                  progress=progress, cancel=cancel)
+
+    reach = max(DECISION_REACH, 512 + max_match_length)
+    # Holds the output and the sequential state only; it never searches,
+    # so it gets no input (and no match finder over the whole of it)
+    writer = LZSSCompressor(b'', engine='brute', memo=False, trace=trace, level=level,
+                            max_match_length=max_match_length, profile=profile)
+    writer.output = BitWriter(BitWriter.worst_case_size(size))
+
+    def resume(limit):
+        # Re-run compressor over a local slice, as _compress_segment: the
+        # window behind the current position up to limit, writing into the
+        # writer's output
+        base = max(0, writer.pos - 2 - WINDOW_SIZE)
+        compressor = LZSSCompressor(view[base:limit], engine='hashchain', memo=memo,
+                                    window_start=writer.pos - base - WINDOW_SIZE, level=level,
+                                    max_match_length=max_match_length, profile=profile)
+        compressor.output = writer.output
+        compressor.trace = writer.trace
+        compressor.pos = writer.pos - base
+        compressor.prev_token_pos = writer.prev_token_pos
+        compressor.prev_was_match = writer.prev_was_match
+        compressor.scenario1_count = writer.scenario1_count
+        return compressor, base
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for start in range(0, size, segment_size):
+            end = min(start + segment_size, size)
+            base = max(0, start - WINDOW_SIZE)
+            futures.append(pool.submit(_compress_segment, bytes(view[base:end + reach]), base, start,
+                                       end, engine, memo, level, max_match_length, profile))
+        parallel_stats['segments'] = len(futures)
+
+        try:
+            for future in futures:
+                positions, token_index, armed, scenario1, tokens = future.result()
+                rerun = None
+                limit = 0
+                while True:
+                    pos = writer.pos - 2
+                    index = bisect_left(positions, pos)
+                    if index == len(positions) or pos >= size:
+                        # Went past the speculation: the next segment takes over
+                        break
+                    if positions[index] == pos and armed[index] == writer.scenario1_armed():
+                        # Same step boundary, same state: the speculation holds from here
+                        if index > 0:
+                            parallel_stats['resyncs'] += 1
+                        kinds, lengths, offsets = tokens.kinds, tokens.lengths, tokens.offsets
+                        for token in range(token_index[index], len(kinds)):
+                            if kinds[token] == TRACE_LITERAL:
+                                writer.emit_literal(offsets[token])
+                            else:
+                                writer.emit_match(lengths[token], offsets[token])
+                        writer.scenario1_count += scenario1[-1] - scenario1[index]
+                        break
+                    if rerun is None or (pos + reach > limit and limit < size):
+                        # Re-runs are usually a token or two: cover the
+                        # lookahead of the next speculative boundary plus a
+                        # window's worth, and move on to a new slice if the
+                        # re-run gets that far
+                        limit = min(size, positions[index] + reach + WINDOW_SIZE)
+                        rerun, base = resume(limit)
+                    rerun.step()
+                    writer.pos = rerun.pos + base
+                    writer.prev_token_pos = rerun.prev_token_pos
+                    writer.prev_was_match = rerun.prev_was_match
+                    writer.scenario1_count = rerun.scenario1_count
+                    parallel_stats['rerun_bytes'] += writer.pos - 2 - pos
+
+                if progress is not None:
+                    progress(writer.pos - 2, size)
+                if cancel is not None:
+                    cancel.check()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    compressed = writer.finish()
+    scenario1_counter = writer.scenario1_count
+    _record_memo_stats(None)
+    return compressed, writer.trace, scenario1_counter
+
+
+def _record_memo_stats(finder):
+    """Publish a MatchMemo's counters in match_memo_stats"""
+    if isinstance(finder, TimedMatchFinder):
+        finder = finder.finder
+    if isinstance(finder, MatchMemo):
+        match_memo_stats['hits'] = finder.hits
+        match_memo_stats['misses'] = finder.misses
+    else:
+        match_memo_stats['hits'] = 0
+        match_memo_stats['misses'] = 0
+
 
 if __name__ == "__main__":
-    import sys
     import argparse
     
     parser = argparse.ArgumentParser(description='LZSS Compressor with lazy matching')
@@ -456,8 +2956,26 @@ if __name__ == "__main__":
                         help='Output compressed file (default: ./lzss_compressed.bin)')
     parser.add_argument('--compare', '-c', default='./compressed_compare.bin',
                         help='File to compare against (default: ./compressed_compare.bin)')
-    parser.add_argument('--decisions', '-d', default='./compression_decisions.txt',
-                        help='Output file for compression decisions (default: ./compression_decisions.txt)')
+    parser.add_argument('--decisions', '-d', default=None,
+                        help='Record the token decisions and write them to this file (L:xx / M:len,off '
+                             f'lines, or a binary trace if the name ends in {TRACE_EXTENSION})')
+    parser.add_argument('--engine', '-e', choices=MATCH_ENGINES, default=DEFAULT_MATCH_ENGINE,
+                        help=f'Match finder engine (default: {DEFAULT_MATCH_ENGINE}; brute = reference scan)')
+    parser.add_argument('--no-memo', action='store_true',
+                        help='Disable the per-compression match memo')
+    parser.add_argument('--level', '-l', choices=COMPRESSION_LEVELS, default=DEFAULT_COMPRESSION_LEVEL,
+                        help=f'Compression level (default: {DEFAULT_COMPRESSION_LEVEL}; '
+                             f'greedy/balanced are faster, optimal is smallest; only exact matches the game)')
+    parser.add_argument('--format', '-f', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help=f'Encoder profile: sav blocks or options sections (default: {DEFAULT_PROFILE})')
+    parser.add_argument('--profile', '-p', action='store_true',
+                        help='Print match finder/decision counters and time per phase')
+    parser.add_argument('--verify', '-V', action='store_true',
+                        help='Check the output against --compare while compressing, stop at the '
+                             'first differing byte and print the traces around it (no output file)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Compress segments on this many processes (same output, '
+                             'see compress_lzss_parallel; ignored with --profile and --level optimal)')
     
     args = parser.parse_args()
     
@@ -466,12 +2984,50 @@ if __name__ == "__main__":
     
     print(f"Compressing: {args.input}")
     print(f"Input size: {len(uncompressed)} bytes")
+
+    if args.verify:
+        try:
+            with open(args.compare, 'rb') as f:
+                reference = f.read()
+        except FileNotFoundError:
+            print(f"\nComparison file not found: {args.compare}")
+            sys.exit(2)
+        mismatch = verify_compression(uncompressed, reference, engine=args.engine,
+                                      memo=not args.no_memo, level=args.level,
+                                      profile=args.format)
+        if mismatch is None:
+            print(f"\n🎯🎯🎯 PERFECT 1:1 MATCH! 🎯🎯🎯 ({len(reference)} bytes)")
+            sys.exit(0)
+        print()
+        print(mismatch.format_report())
+        sys.exit(1)
     
-    compressed, decisions, s1_count = compress_lzss_lazy(uncompressed)
+    stats = CompressionStats() if args.profile else None
+    if args.workers is not None and stats is None and args.level != 'optimal':
+        compressed, decisions, s1_count = compress_lzss_parallel(
+            uncompressed, workers=args.workers, engine=args.engine, memo=not args.no_memo,
+            trace=args.decisions is not None, level=args.level, profile=args.format)
+        print(f"Parallel: {parallel_stats['segments']} segments, "
+              f"{parallel_stats['resyncs']} resyncs, {parallel_stats['rerun_bytes']} bytes re-run")
+    else:
+        compressed, decisions, s1_count = compress_lzss_lazy(
+            uncompressed, engine=args.engine, memo=not args.no_memo,
+            trace=args.decisions is not None, level=args.level, profile=args.format,
+            stats=stats)
 
     print(f"Compressed size: {len(compressed)} bytes ({100*len(compressed)/len(uncompressed):.1f}%)")
-    print(f"Decisions: {len(decisions)}")
+    if decisions is not None:
+        print(f"Decisions: {len(decisions)}")
     print(f"Scenario 1 optimizations applied: {s1_count}")
+    lookups = match_memo_stats['hits'] + match_memo_stats['misses']
+    if lookups:
+        print(f"Match memo: {match_memo_stats['hits']} hits / {lookups} lookups "
+              f"({match_memo_stats['misses']} searches)")
+    if stats is not None:
+        print("\nProfile:")
+        for line in stats.format_report().splitlines():
+            print(f"  {line}")
+        print()
     
     # Compare with game
     try:
@@ -499,12 +3055,14 @@ if __name__ == "__main__":
     with open(args.output, 'wb') as f:
         f.write(compressed)
     
-    with open(args.decisions, 'w') as f:
-        for dec in decisions:
-            if dec[0] == 'L':
-                f.write(f"L:{dec[1]:02x}\n")
-            else:
-                f.write(f"M:{dec[1]},{dec[2]}\n")
-    
+    if decisions is not None:
+        if args.decisions.endswith(TRACE_EXTENSION):
+            with open(args.decisions, 'wb') as f:
+                f.write(decisions.to_bytes())
+        else:
+            with open(args.decisions, 'w') as f:
+                decisions.write_text(f)
+
     print(f"\nSaved compressed output to: {args.output}")
-    print(f"Saved decisions to: {args.decisions}")
+    if decisions is not None:
+        print(f"Saved decisions to: {args.decisions}")
@@ -44,12 +44,16 @@ Bit Reading:
 - Bits are read from LSB to MSB within each flag byte
 - Flag bytes are consumed as needed when flag_bits < required bits
 - The decompressor maintains a flag register and bit counter
+- Runs of literal flags are looked up per flag register value
+  (FLAG_LITERAL_RUNS) and their bytes copied as one slice
 
 Edge Cases:
 ----------
 - Negative src_pos (offset beyond start): Output zero bytes
 - Offset of 0 in long match: Terminator - stop decompression immediately
 - Extended length with trailing 0x00 bytes: Each adds 255 to length
+- Expected size given (from the block header): decoding into a buffer of
+  exactly that size, any other decoded size raises DecompressedSizeError
 
 OPTIONS File Structure:
 ----------------------
@@ -85,6 +89,18 @@ import os
 import struct
 
 
+# Back-reference reach: long-match distances are 13 bits (at most 8191)
+WINDOW_SIZE = 8192
+
+# Leading literal count of each flag register value: the number of 0 bits
+# below its lowest 1 bit (8 for 0x00), read LSB first like the decoder
+FLAG_LITERAL_RUNS = bytes((flags & -flags).bit_length() - 1 if flags else 8
+                          for flags in range(256))
+
+# Compressed bytes read per step by StreamingLZSSDecompressor.iter_chunks()
+STREAM_CHUNK_SIZE = 16384
+
+
 def adler32(data: bytes) -> int:
     """
     Calculate Adler-32 checksum using AC Brotherhood's non-standard variant.
@@ -192,27 +208,146 @@ def find_section_headers(data: bytes) -> list:
     return headers
 
 
+class DecompressedSizeError(ValueError):
+    """
+    Decompressed size differs from the size the block header announces
+
+    Attributes:
+        expected_size: Size passed to the decompressor
+        actual_size: Bytes decoded when the stream ended, or for an overrun
+                     the size the overrunning token would have produced
+        input_pos: Compressed offset where decoding stopped
+    """
+    def __init__(self, expected_size: int, actual_size: int, input_pos: int):
+        self.expected_size = expected_size
+        self.actual_size = actual_size
+        self.input_pos = input_pos
+        if self.overrun:
+            problem = f"stream overruns the expected size (at least {actual_size} bytes)"
+        else:
+            problem = f"stream ends after {actual_size} bytes"
+        super().__init__(f"Expected {expected_size} decompressed bytes, {problem}; "
+                         f"stopped at compressed offset {input_pos}")
+
+    @property
+    def overrun(self) -> bool:
+        return self.actual_size > self.expected_size
+
+
 class LZSSDecompressor:
     """
     LZSS Decompressor matching AC Brotherhood's exact format
     Tested and verified against game decompression output
     """
 
-    def decompress(self, compressed: bytes) -> bytes:
+    def decompress(self, compressed: bytes, expected_size: int = None) -> bytes:
         """
         Decompress LZSS data
 
         Args:
             compressed: Compressed bytes from OPTIONS file
+            expected_size: Optional decompressed size from the block header
+                           (SavHeader.uncompressed_size,
+                           SectionHeader.uncompressed_length). The output is
+                           then allocated once up front, and a stream that
+                           decodes to any other size raises
+                           DecompressedSizeError.
 
         Returns:
             Decompressed bytes
         """
+        if expected_size is not None:
+            output = bytearray(expected_size)
+            size, in_ptr = self._decode(compressed, output, fixed=True)
+            if size != expected_size:
+                raise DecompressedSizeError(expected_size, size, in_ptr)
+            return bytes(output)
+
         if not compressed:
             return b''
 
-        output = bytearray()
+        # Unknown size: start from a typical ratio, _decode grows as needed
+        output = bytearray(8 * len(compressed))
+        size, _ = self._decode(compressed, output, fixed=False)
+        del output[size:]
+        return bytes(output)
+
+    def decompress_checked(self, compressed: bytes, expected_size: int = None) -> tuple:
+        """
+        Decompress LZSS data, checking it against the size from the block
+        header without giving up on a mismatch
+
+        For tools that report a bad size and carry on with what the stream
+        holds (sav_parser, OPTIONS validation). The stream is decoded once,
+        into a buffer preallocated to expected_size that only grows if the
+        stream overruns it.
+
+        Args:
+            compressed: Compressed bytes
+            expected_size: Decompressed size from the block header, or None
+
+        Returns:
+            tuple: (decompressed_bytes, error) - error is None, or a
+                   DecompressedSizeError for the full decoded size
+        """
+        if expected_size is None:
+            return self.decompress(compressed), None
+
+        output = bytearray(expected_size)
+        size, in_ptr = self._decode(compressed, output, fixed=False)
+        del output[size:]
+        error = None
+        if size != expected_size:
+            error = DecompressedSizeError(expected_size, size, in_ptr)
+        return bytes(output), error
+
+    def decompress_into(self, compressed: bytes, dest_buffer) -> int:
+        """
+        Decompress LZSS data into a caller-supplied buffer
+
+        Lets batch jobs reuse one arena per block type instead of allocating
+        a fresh output per file. Only the first (returned) number of bytes
+        are written; the rest of the buffer is left as it was.
+
+        Args:
+            compressed: Compressed bytes
+            dest_buffer: Writable buffer (bytearray, memoryview, mmap or a
+                         memoryview slice of one), at least as large as the
+                         decompressed data
+
+        Returns:
+            Number of bytes written
+
+        Raises:
+            DecompressedSizeError: if the data does not fit in dest_buffer
+        """
+        if isinstance(dest_buffer, bytearray):
+            output = dest_buffer
+        else:
+            output = memoryview(dest_buffer)
+            if output.readonly:
+                raise TypeError("dest_buffer must be writable")
+            if output.format != 'B' or output.ndim != 1:
+                output = output.cast('B')
+        size, _ = self._decode(compressed, output, fixed=True)
+        return size
+
+    def _decode(self, compressed, output, fixed: bool) -> tuple:
+        """
+        Decode into output from position 0 on, through an index cursor
+
+        If fixed, output (a bytearray or flat byte memoryview) is never
+        resized and a token that would write past its end raises
+        DecompressedSizeError. Otherwise output is a bytearray that is grown
+        in place when full.
+
+        Returns:
+            tuple: (bytes decoded, compressed offset where decoding stopped)
+        """
         in_ptr = 0
+        out_pos = 0
+        capacity = len(output)
+        literal_runs = FLAG_LITERAL_RUNS
         flags = 0
         flag_bits = 0
 
@@ -225,98 +360,400 @@ class LZSSDecompressor:
                 in_ptr += 1
                 flag_bits = 8
 
-            flag_bit = flags & 1
+            # Literal bytes: every 0 bit up to the next 1 (or the end of
+            # the register) is a literal, copied together as one slice
+            if not flags & 1:
+                run = literal_runs[flags & 0xFF]
+                if run > flag_bits:
+                    run = flag_bits
+                if run > len(compressed) - in_ptr:
+                    run = len(compressed) - in_ptr
+                    if not run:
+                        break
+                if out_pos + run > capacity:
+                    if fixed:
+                        raise DecompressedSizeError(capacity, capacity + 1,
+                                                    in_ptr + capacity - out_pos)
+                    output.extend(bytes(capacity + run))
+                    capacity = len(output)
+                if run == 1:
+                    output[out_pos] = compressed[in_ptr]
+                else:
+                    output[out_pos:out_pos + run] = compressed[in_ptr:in_ptr + run]
+                out_pos += run
+                in_ptr += run
+                flags >>= run
+                flag_bits -= run
+                continue
+
+            # Match (flag bit 1) - read second flag bit
             flags >>= 1
             flag_bits -= 1
-
-            if flag_bit == 0:
-                # Literal byte
+            if flag_bits < 1:
                 if in_ptr >= len(compressed):
                     break
-                output.append(compressed[in_ptr])
+                flags = compressed[in_ptr]
                 in_ptr += 1
-            else:
-                # Match - read second flag bit
-                if flag_bits < 1:
+                flag_bits = 8
+
+            flag_bit2 = flags & 1
+            flags >>= 1
+            flag_bits -= 1
+
+            if flag_bit2 == 0:
+                # Short match (length 2-5, offset 1-256)
+                if flag_bits < 2:
                     if in_ptr >= len(compressed):
                         break
-                    flags = compressed[in_ptr]
+                    flags |= compressed[in_ptr] << flag_bits
                     in_ptr += 1
-                    flag_bits = 8
-
-                flag_bit2 = flags & 1
-                flags >>= 1
-                flag_bits -= 1
-
-                if flag_bit2 == 0:
-                    # Short match (length 2-5, offset 1-256)
-                    if flag_bits < 2:
-                        if in_ptr >= len(compressed):
-                            break
-                        flags |= compressed[in_ptr] << flag_bits
-                        in_ptr += 1
-                        flag_bits += 8
+                    flag_bits += 8
 
-                    length = (flags & 3) + 2
-                    flags >>= 2
-                    flag_bits -= 2
+                length = (flags & 3) + 2
+                flags >>= 2
+                flag_bits -= 2
+
+                if in_ptr >= len(compressed):
+                    break
+                distance = compressed[in_ptr] + 1
+                in_ptr += 1
+            else:
+                # Long match (length 3+, offset 0-8191)
+                if in_ptr + 1 >= len(compressed):
+                    break
+
+                byte1 = compressed[in_ptr]
+                byte2 = compressed[in_ptr + 1]
+                in_ptr += 2
+
+                len_field = byte1 >> 5
+                low_offset = byte1 & 0x1F
+                high_offset = byte2
+                distance = (high_offset << 5) | low_offset
+
+                # CRITICAL BUG FIX: Check for terminator (distance == 0)
+                # This prevents attempting to copy with offset 0
+                if distance == 0:
+                    break
 
+                if len_field == 0:
+                    # Variable length encoding
+                    length = 9
+                    while in_ptr < len(compressed) and compressed[in_ptr] == 0:
+                        in_ptr += 1
+                        length += 255
                     if in_ptr >= len(compressed):
                         break
-                    offset_byte = compressed[in_ptr]
+                    length += compressed[in_ptr]
                     in_ptr += 1
+                else:
+                    length = len_field + 2
+
+            if out_pos + length > capacity:
+                if fixed:
+                    raise DecompressedSizeError(capacity, out_pos + length, in_ptr)
+                output.extend(bytes(max(capacity, length)))
+                capacity = len(output)
+            self._copy_match(output, out_pos, distance, length)
+            out_pos += length
+
+        return out_pos, in_ptr
+
+    @staticmethod
+    def _copy_match(output, out_pos: int, distance: int, length: int):
+        """
+        Write a match of 'length' bytes from 'distance' bytes back at out_pos
+
+        Same result as copying byte by byte: positions before the start of
+        the output read as zero, and an overlapping match (distance < length)
+        repeats the last 'distance' bytes.
+        """
+        src_pos = out_pos - distance
+        if src_pos < 0:
+            zeros = min(-src_pos, length)
+            output[out_pos:out_pos + zeros] = bytes(zeros)
+            out_pos += zeros
+            length -= zeros
+            if not length:
+                return
+            src_pos = 0
+
+        if distance >= length:
+            output[out_pos:out_pos + length] = output[src_pos:src_pos + length]
+            return
+
+        # Run-style match: the last 'distance' bytes repeat (sequence
+        # repetition fills the result by doubling its copied prefix)
+        pattern = bytes(output[src_pos:out_pos]) * (length // distance + 1)
+        output[out_pos:out_pos + length] = pattern[:length]
+
+    def iter_tokens(self, compressed: bytes):
+        """
+        Parse LZSS data into its token sequence without producing output
+
+        Uses the same bit reading as decompress(). Stops at the terminator.
 
-                    distance = offset_byte + 1
-                    src_pos = len(output) - distance
+        Args:
+            compressed: Compressed bytes
+
+        Yields:
+            ('L', byte_value) for literals, ('M', length, distance) for matches
+        """
+        in_ptr = 0
+        flags = 0
+        flag_bits = 0
+        size = len(compressed)
 
-                    for _ in range(length):
-                        if src_pos < 0:
-                            output.append(0)
-                        else:
-                            output.append(output[src_pos])
-                        src_pos += 1
+        while in_ptr < size:
+            # Read flag bit
+            if flag_bits < 1:
+                flags = compressed[in_ptr]
+                in_ptr += 1
+                flag_bits = 8
+
+            flag_bit = flags & 1
+            flags >>= 1
+            flag_bits -= 1
+
+            if flag_bit == 0:
+                # Literal byte
+                if in_ptr >= size:
+                    return
+                yield ('L', compressed[in_ptr])
+                in_ptr += 1
+                continue
+
+            # Match - read second flag bit
+            if flag_bits < 1:
+                if in_ptr >= size:
+                    return
+                flags = compressed[in_ptr]
+                in_ptr += 1
+                flag_bits = 8
+
+            flag_bit2 = flags & 1
+            flags >>= 1
+            flag_bits -= 1
+
+            if flag_bit2 == 0:
+                # Short match (length 2-5, offset 1-256)
+                if flag_bits < 2:
+                    if in_ptr >= size:
+                        return
+                    flags |= compressed[in_ptr] << flag_bits
+                    in_ptr += 1
+                    flag_bits += 8
+
+                length = (flags & 3) + 2
+                flags >>= 2
+                flag_bits -= 2
+
+                if in_ptr >= size:
+                    return
+                yield ('M', length, compressed[in_ptr] + 1)
+                in_ptr += 1
+            else:
+                # Long match (length 3+, offset 0-8191)
+                if in_ptr + 1 >= size:
+                    return
+
+                byte1 = compressed[in_ptr]
+                byte2 = compressed[in_ptr + 1]
+                in_ptr += 2
+
+                len_field = byte1 >> 5
+                distance = (byte2 << 5) | (byte1 & 0x1F)
+
+                # Terminator
+                if distance == 0:
+                    return
+
+                if len_field == 0:
+                    # Variable length encoding
+                    length = 9
+                    while in_ptr < size and compressed[in_ptr] == 0:
+                        in_ptr += 1
+                        length += 255
+                    if in_ptr >= size:
+                        return
+                    length += compressed[in_ptr]
+                    in_ptr += 1
                 else:
-                    # Long match (length 3+, offset 0-8191)
-                    if in_ptr + 1 >= len(compressed):
+                    length = len_field + 2
+
+                yield ('M', length, distance)
+
+
+class StreamingLZSSDecompressor:
+    """
+    Incremental LZSSDecompressor for compressed input that arrives in pieces
+
+        stream = StreamingLZSSDecompressor()
+        for chunk in stream.iter_chunks(f):     # file object, socket file, chunks
+            parser.feed(chunk)
+        rest = stream.unused_data               # bytes after the 20 00 terminator
+
+    The concatenated output is identical to LZSSDecompressor.decompress() on
+    the joined input, for any chunking. Only the last WINDOW_SIZE output
+    bytes are kept for back-references, plus the compressed bytes of a token
+    that is split across chunks: its flag bits, offset bytes or a run of
+    extended-length bytes are held back until the rest of it arrives.
+    """
+
+    def __init__(self):
+        # Compressed bytes of the incomplete token, and the flag register
+        # state at its start
+        self.pending = b''
+        self.flags = 0
+        self.flag_bits = 0
+
+        self.window = bytearray()
+        self.input_size = 0
+        self.output_size = 0
+        self.finished = False
+        self.unused_data = b''
+
+    def feed(self, chunk) -> bytes:
+        """
+        Add compressed bytes
+
+        Returns:
+            The decompressed bytes they complete (may be empty)
+        """
+        if self.finished:
+            raise ValueError("Stream already ended at its terminator")
+        self.input_size += len(chunk)
+        compressed = b''.join((self.pending, chunk))
+        size = len(compressed)
+
+        window = self.window
+        out_start = len(window)
+        copy_match = LZSSDecompressor._copy_match
+        literal_runs = FLAG_LITERAL_RUNS
+        in_ptr = 0
+        flags = self.flags
+        flag_bits = self.flag_bits
+
+        while True:
+            # A token is only consumed once all of its bytes are here
+            token_ptr = in_ptr
+            token_flags = flags
+            token_bits = flag_bits
+
+            # Read flag bit
+            if flag_bits < 1:
+                if in_ptr >= size:
+                    break
+                flags = compressed[in_ptr]
+                in_ptr += 1
+                flag_bits = 8
+
+            # Literal bytes, as a slice (see LZSSDecompressor._decode)
+            if not flags & 1:
+                run = literal_runs[flags & 0xFF]
+                if run > flag_bits:
+                    run = flag_bits
+                if run > size - in_ptr:
+                    run = size - in_ptr
+                    if not run:
                         break
+                window += compressed[in_ptr:in_ptr + run]
+                in_ptr += run
+                flags >>= run
+                flag_bits -= run
+                continue
 
-                    byte1 = compressed[in_ptr]
-                    byte2 = compressed[in_ptr + 1]
-                    in_ptr += 2
+            # Match (flag bit 1) - read second flag bit
+            flags >>= 1
+            flag_bits -= 1
+            if flag_bits < 1:
+                if in_ptr >= size:
+                    break
+                flags = compressed[in_ptr]
+                in_ptr += 1
+                flag_bits = 8
 
-                    len_field = byte1 >> 5
-                    low_offset = byte1 & 0x1F
-                    high_offset = byte2
-                    distance = (high_offset << 5) | low_offset
+            flag_bit2 = flags & 1
+            flags >>= 1
+            flag_bits -= 1
 
-                    # CRITICAL BUG FIX: Check for terminator (distance == 0)
-                    # This prevents attempting to copy with offset 0
-                    if distance == 0:
+            if flag_bit2 == 0:
+                # Short match (length 2-5, offset 1-256)
+                if flag_bits < 2:
+                    if in_ptr >= size:
                         break
+                    flags |= compressed[in_ptr] << flag_bits
+                    in_ptr += 1
+                    flag_bits += 8
+
+                length = (flags & 3) + 2
+                flags >>= 2
+                flag_bits -= 2
+
+                if in_ptr >= size:
+                    break
+                distance = compressed[in_ptr] + 1
+                in_ptr += 1
+            else:
+                # Long match (length 3+, offset 0-8191)
+                if in_ptr + 1 >= size:
+                    break
+
+                byte1 = compressed[in_ptr]
+                byte2 = compressed[in_ptr + 1]
+                in_ptr += 2
 
-                    if len_field == 0:
-                        # Variable length encoding
-                        length = 9
-                        while in_ptr < len(compressed) and compressed[in_ptr] == 0:
-                            in_ptr += 1
-                            length += 255
-                        if in_ptr >= len(compressed):
-                            break
-                        length += compressed[in_ptr]
+                len_field = byte1 >> 5
+                distance = (byte2 << 5) | (byte1 & 0x1F)
+
+                # Terminator
+                if distance == 0:
+                    self.finished = True
+                    self.unused_data = compressed[in_ptr:]
+                    token_ptr = size
+                    break
+
+                if len_field == 0:
+                    # Variable length encoding
+                    length = 9
+                    while in_ptr < size and compressed[in_ptr] == 0:
                         in_ptr += 1
-                    else:
-                        length = len_field + 2
+                        length += 255
+                    if in_ptr >= size:
+                        break
+                    length += compressed[in_ptr]
+                    in_ptr += 1
+                else:
+                    length = len_field + 2
 
-                    src_pos = len(output) - distance
+            copy_match(window, len(window), distance, length)
 
-                    for _ in range(length):
-                        if src_pos < 0:
-                            output.append(0)
-                        else:
-                            output.append(output[src_pos])
-                        src_pos += 1
+        self.pending = compressed[token_ptr:]
+        self.flags = token_flags
+        self.flag_bits = token_bits
 
-        return bytes(output)
+        output = bytes(window[out_start:])
+        self.output_size += len(output)
+        if len(window) > WINDOW_SIZE:
+            del window[:-WINDOW_SIZE]
+        return output
+
+    def iter_chunks(self, source, chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Decompress from a file-like object (anything with read(n)) or an
+        iterable of byte chunks, yielding the output as it becomes available
+
+        Stops at the terminator; input read past it is left in unused_data.
+        """
+        chunks = source
+        if hasattr(source, 'read'):
+            chunks = iter(lambda: source.read(chunk_size), b'')
+        for chunk in chunks:
+            output = self.feed(chunk)
+            if output:
+                yield output
+            if self.finished:
+                return
 
 
 def decompress(data: bytes) -> bytes:
@@ -443,7 +880,9 @@ def decompress_options_file(input_file: str, section_filter: int = None) -> dict
 
     for section_num, start_offset, end_offset, compressed_data, header_info in sections:
         try:
-            decompressed = decompressor.decompress(compressed_data)
+            # Sized from the header; a mismatch is reported with the rest
+            decompressed, size_error = decompressor.decompress_checked(
+                compressed_data, header_info.uncompressed_length if header_info else None)
 
             # Perform validation if header is available
             validation = {
@@ -457,6 +896,7 @@ def decompress_options_file(input_file: str, section_filter: int = None) -> dict
                 'expected_checksum': None,
                 'actual_checksum': None,
                 'checksum_match': None,
+                'size_error': str(size_error) if size_error else None,
             }
 
             if header_info:
@@ -576,6 +1016,8 @@ def main():
                 match_str = "PASS" if validation['uncompressed_size_match'] else "FAIL"
                 print(f"    Uncompressed size: Expected {validation['expected_uncompressed_size']:6d} bytes, "
                       f"Got {validation['actual_uncompressed_size']:6d} bytes [{match_str}]")
+                if validation['size_error']:
+                    print(f"    Decompression error: {validation['size_error']}")
 
             # Checksum validation (Adler-32 with zero seed)
             if validation['expected_checksum'] is not None:
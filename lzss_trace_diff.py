@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+LZSS Decision Trace Diff
+========================
+
+Compares the token sequences of two LZSS streams and reports where their
+decisions diverge. Each side is either a binary decision trace (written by
+lzss_compressor_final.py --decisions out.lztr) or a compressed stream, whose
+tokens are read back with LZSSDecompressor.iter_tokens.
+
+The traces are compared a column at a time on whole slices, so identical
+stretches cost no per-token Python work. After a divergence the two sides
+are realigned at the next input position where both start the same token,
+and the comparison continues from there.
+
+Given two directories, every file of the first is compared with the file
+of the same relative path in the second, one summary line per file.
+
+Usage:
+  python lzss_trace_diff.py ours.lztr game_block4.bin
+  python lzss_trace_diff.py ours.lztr theirs.lztr --max-divergences 10
+  python lzss_trace_diff.py traces/ reference_blocks/
+"""
+
+import os
+import sys
+import argparse
+from array import array
+from itertools import accumulate
+
+from lzss_compressor_final import DecisionTrace, TRACE_LITERAL, TRACE_MAGIC
+
+
+def load_trace(path):
+    """Read a binary decision trace, or the token trace of a compressed stream"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] == TRACE_MAGIC:
+        return DecisionTrace.from_bytes(data)
+    return DecisionTrace.from_compressed(data)
+
+
+def token_starts(trace):
+    """Input position of every token, plus the total length at the end"""
+    return array('q', accumulate(trace.lengths, initial=0))
+
+
+def _same(a, start_a, b, start_b, count):
+    return (a.lengths[start_a:start_a + count] == b.lengths[start_b:start_b + count] and
+            a.offsets[start_a:start_a + count] == b.offsets[start_b:start_b + count])
+
+
+def first_difference(a, start_a, b, start_b):
+    """
+    Number of equal tokens from a[start_a] and b[start_b] on, or None if the
+    rest of both traces is identical.
+
+    Binary search over slice comparisons: O(n) in C instead of a Python loop.
+    """
+    count = min(len(a) - start_a, len(b) - start_b)
+    if _same(a, start_a, b, start_b, count):
+        return None if len(a) - start_a == len(b) - start_b else count
+    low, high = 0, count
+    while high - low > 1:
+        mid = (low + high) // 2
+        if _same(a, start_a + low, b, start_b + low, mid - low):
+            low = mid
+        else:
+            high = mid
+    if low < count and _same(a, start_a + low, b, start_b + low, 1):
+        low += 1
+    return low
+
+
+def find_resync(a, starts_a, index_a, b, starts_b, index_b):
+    """
+    First token pair after a divergence that starts at the same input
+    position and is the same token.
+
+    Returns:
+        tuple: (index_a, index_b), or the trace lengths if they never realign
+    """
+    index_a += 1
+    index_b += 1
+    while index_a < len(a) and index_b < len(b):
+        pos_a = starts_a[index_a]
+        pos_b = starts_b[index_b]
+        if pos_a < pos_b:
+            index_a += 1
+        elif pos_b < pos_a:
+            index_b += 1
+        elif a.lengths[index_a] == b.lengths[index_b] and a.offsets[index_a] == b.offsets[index_b]:
+            return index_a, index_b
+        else:
+            index_a += 1
+            index_b += 1
+    return len(a), len(b)
+
+
+def diff_traces(a, b, max_divergences=3):
+    """
+    Find the first divergent stretches of two traces.
+
+    Returns:
+        list of dicts with the input position and token index of each side
+        where a stretch starts ('input_pos', 'token_a', 'token_b'), where
+        the shared tokens before it start ('shared_a', 'shared_b': the
+        previous resync, or 0) and where the traces realign ('resync_pos',
+        'resync_a', 'resync_b'; resync_pos is None if they never do)
+    """
+    starts_a = token_starts(a)
+    starts_b = token_starts(b)
+    divergences = []
+    index_a = index_b = 0
+    while len(divergences) < max_divergences:
+        shared_a, shared_b = index_a, index_b
+        equal = first_difference(a, index_a, b, index_b)
+        if equal is None:
+            break
+        index_a += equal
+        index_b += equal
+        resync_a, resync_b = find_resync(a, starts_a, index_a, b, starts_b, index_b)
+        resync_pos = starts_a[resync_a] if resync_a < len(a) else None
+        divergences.append({
+            'input_pos': starts_a[index_a] if index_a < len(a) else starts_a[-1],
+            'token_a': index_a,
+            'token_b': index_b,
+            'shared_a': shared_a,
+            'shared_b': shared_b,
+            'resync_pos': resync_pos,
+            'resync_a': resync_a,
+            'resync_b': resync_b,
+        })
+        if resync_pos is None:
+            break
+        index_a, index_b = resync_a, resync_b
+    return divergences
+
+
+def format_token(trace, index):
+    if index >= len(trace):
+        return '-'
+    if trace.kinds[index] == TRACE_LITERAL:
+        return f"L:{trace.offsets[index]:02x}"
+    return f"M:{trace.lengths[index]},{trace.offsets[index]}"
+
+
+def print_divergence(a, b, divergence, context=3, limit=24):
+    """Print one divergent stretch, the two token sequences side by side"""
+    token_a = divergence['token_a']
+    token_b = divergence['token_b']
+    resync = divergence['resync_pos']
+    print(f"  Input position {divergence['input_pos']}: token {token_a} vs {token_b}, "
+          + (f"realigned at position {resync}" if resync is not None else "never realigned"))
+
+    # Shared tokens before the stretch (not those of the previous one)
+    for back in range(min(context, token_a - divergence['shared_a']), 0, -1):
+        print(f"    {token_a - back:>7}  {format_token(a, token_a - back):<16}"
+              f"{format_token(b, token_b - back)}")
+
+    count_a = divergence['resync_a'] - token_a
+    count_b = divergence['resync_b'] - token_b
+    rows = max(count_a, count_b, 1)
+    for row in range(min(rows, limit)):
+        left = format_token(a, token_a + row) if row < count_a or rows == 1 else ''
+        right = format_token(b, token_b + row) if row < count_b or rows == 1 else ''
+        print(f"   >{token_a + row:>7}  {left:<16}{right}")
+    if rows > limit:
+        print(f"    ... {rows - limit} more tokens")
+
+
+def compare_files(path_a, path_b, max_divergences, verbose=True):
+    """Compare two files, returning True if their traces are identical"""
+    a = load_trace(path_a)
+    b = load_trace(path_b)
+    divergences = diff_traces(a, b, max_divergences)
+    if not divergences:
+        if verbose:
+            print(f"Identical: {len(a)} tokens")
+        return True
+
+    size_a = sum(a.lengths)
+    size_b = sum(b.lengths)
+    if verbose:
+        print(f"{path_a}: {len(a)} tokens, {size_a} bytes")
+        print(f"{path_b}: {len(b)} tokens, {size_b} bytes")
+        if size_a != size_b:
+            print("  (the traces cover different amounts of input)")
+        for divergence in divergences:
+            print_divergence(a, b, divergence)
+    else:
+        first = divergences[0]
+        print(f"  DIFF       {path_a}: position {first['input_pos']}, "
+              f"token {first['token_a']}/{first['token_b']}")
+    return False
+
+
+def compare_directories(dir_a, dir_b, max_divergences):
+    """Compare every file of dir_a with its namesake in dir_b"""
+    identical = differing = missing = 0
+    for root, _, files in os.walk(dir_a):
+        for name in sorted(files):
+            path_a = os.path.join(root, name)
+            path_b = os.path.join(dir_b, os.path.relpath(path_a, dir_a))
+            if not os.path.exists(path_b):
+                print(f"  MISSING    {path_b}")
+                missing += 1
+            elif compare_files(path_a, path_b, max_divergences, verbose=False):
+                identical += 1
+            else:
+                differing += 1
+    print(f"\n{identical} identical, {differing} differing, {missing} missing")
+    return differing == 0 and missing == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Diff the token decisions of two LZSS traces or compressed streams',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('a', help='Binary trace (.lztr), compressed stream, or directory')
+    parser.add_argument('b', help='Binary trace (.lztr), compressed stream, or directory')
+    parser.add_argument('--max-divergences', '-n', type=int, default=3,
+                        help='Divergent stretches to report per file (default: 3)')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.a) and os.path.isdir(args.b):
+        ok = compare_directories(args.a, args.b, max(1, args.max_divergences))
+    else:
+        ok = compare_files(args.a, args.b, max(1, args.max_divergences))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
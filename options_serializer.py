@@ -37,6 +37,11 @@ import os
 import struct
 import argparse
 
+# Shared LZSS codec (same engine as the SAV compressor, 'options' profile)
+import lzss_compressor_final
+from lzss_compressor_final import (COMPRESSION_LEVELS, DEFAULT_COMPRESSION_LEVEL,
+                                   DEFAULT_MATCH_ENGINE)
+
 
 # ============================================================================
 # ADLER-32 CHECKSUM (Zero-Seed Variant)
@@ -67,229 +72,27 @@ def adler32(data: bytes) -> int:
 
 
 # ============================================================================
-# LZSS COMPRESSION (Embedded - Exact 1:1 Implementation)
+# LZSS COMPRESSION (shared codec, OPTIONS profile)
 # ============================================================================
 
-def add_bit(output, bit_accum, bit_counter, flag_byte_ptr, bit_value):
-    """Add single bit - exact Ghidra implementation"""
-    old_bit_counter = bit_counter
-
-    if bit_counter == 0:
-        flag_byte_ptr = len(output)
-        output.append(0)
-
-    bit_counter += 1
-    bit_accum |= (bit_value & 1) << (old_bit_counter & 0x1f)
-
-    if (bit_counter > 7):
-        output[flag_byte_ptr] = bit_accum & 0xFF
-        bit_accum >>= 8
-        bit_counter -= 8
-        if bit_counter > 0:
-            flag_byte_ptr = len(output)
-            output.append(0)
-
-    return output, bit_accum, bit_counter, flag_byte_ptr
-
-
-def find_best_match(data, pos):
-    """
-    Find best match scanning backward from current position.
-    Data includes 2-byte prefix, pos >= 2.
+def compress_lzss_lazy(data, level=DEFAULT_COMPRESSION_LEVEL, engine=DEFAULT_MATCH_ENGINE,
+                       progress=None, cancel=None):
     """
-    if pos < 2:
-        return 0, 0
-
-    best_length = 0
-    best_offset = 0
-    second_best_offset = 0
-    max_length = min(263, len(data) - pos)
-    max_offset = min(8192, pos)
-
-    # CRITICAL FIX: Reject matches that reference position 0 or 1 (the 2-byte prefix)
-    # The game encoder doesn't use matches that go back to the prefix area
-    # This typically only affects the very end of files with long runs of zeros
-    max_offset = min(max_offset, pos - 2)
-
-    # Scan BACKWARD from current position (closer matches found last)
-    for check_pos in range(pos - 1, max(0, pos - max_offset) - 1, -1):
-        offset = pos - check_pos
-        length = 0
-
-        while (length < max_length and
-               pos + length < len(data) and
-               data[check_pos + length] == data[pos + length]):
-            length += 1
-
-        # Update only if strictly longer (keeps first equal match = highest offset)
-        if length > best_length and length >= 2:
-            best_length = length
-            second_best_offset = best_offset
-            best_offset = offset
-
-    # Game adds +1 to LONG match offsets only, requires final offset >= 2
-    if best_offset > 0 and best_length >= 2:
-        is_short_match = (2 <= best_length <= 5 and (best_offset + 1) <= 256)
-        if not is_short_match:
-            best_offset += 1
-            # Only reject offset < 2 for LONG matches (short matches allow offset=1 for RLE)
-            if best_offset < 2:
-                return 0, 0  # Reject if final offset < 2
-
-    return best_length, best_offset
-
-
-def calculate_match_cost(length, offset):
-    """Calculate cost in bits for encoding a match"""
-    if 2 <= length <= 5 and offset <= 256:
-        # Short match: 1 flag + 1 type + 2 length + 8 offset = 12 bits
-        return 12
-    elif length < 10:
-        # Long match: 1 flag + 1 type + 16 data = 18 bits
-        return 18
-    else:
-        # Very long match with continuation bytes
-        extra_bytes = (length - 9 + 254) // 255
-        return 18 + (extra_bytes * 8)
+    Compress one OPTIONS section.
 
+    Runs the shared LZSS codec with the 'options' profile: 263-byte matches,
+    short matches up to offset 255, and no Scenario 1 or match truncation
+    (see lzss_compressor_final.LZSSProfile).
 
-def compress_lzss_lazy(data):
-    """
-    Compress using lazy matching (lookahead optimization).
-    Uses 2-byte zero prefix - input starts at buffer position 2.
-    """
-    # Add 2-byte zero prefix
-    buffered_data = bytearray([0x00, 0x00]) + bytearray(data)
-
-    output = bytearray()
-    bit_accum = 0
-    bit_counter = 0
-    flag_byte_ptr = 0
-
-    # Start at position 2 (after 2-byte prefix)
-    pos = 2
-
-    while pos < len(buffered_data):
-        # Find best match at current position
-        curr_length, curr_offset = find_best_match(buffered_data, pos)
-
-        # Force literal at the very first position (game behavior)
-        if pos == 2:
-            curr_length = 0
-
-        # LAZY MATCHING with exact game logic
-        if curr_length >= 2 and pos + 1 < len(buffered_data):
-            next_length, next_offset = find_best_match(buffered_data, pos + 1)
-
-            # Determine match types
-            curr_is_short = (2 <= curr_length <= 5 and curr_offset <= 256)
-            next_is_short = (2 <= next_length <= 5 and next_offset <= 256)
-
-            # Calculate adjustment (from decompiled code logic)
-            if curr_is_short:
-                adjustment = 2
-            else:
-                adjustment = 1
+    level 'exact' (default) reproduces the game's output. The other levels
+    (faster 'balanced' / 'greedy', smallest 'optimal') are not byte-identical
+    but decode to the same data (see lzss_compressor_final.compress_lzss_lazy).
 
-            # Adjust based on transition between short/long matches
-            if curr_is_short and not next_is_short and next_length >= 2:
-                adjustment += 2  # local_10 = 2
-
-            if next_is_short and not curr_is_short:
-                adjustment -= 1
-
-            if adjustment < 1:
-                adjustment = 1
-
-            # SHORT→SHORT transitions use adjustment=1
-            if curr_is_short and next_is_short:
-                adjustment = 1
-
-            # Compare: if next_length >= curr_length + adjustment, use literal (lazy)
-            if next_length >= curr_length + adjustment:
-                curr_length = 0  # Force literal
-
-        if curr_length >= 2:
-            # Check if match is worth encoding (vs literal)
-            match_cost = calculate_match_cost(curr_length, curr_offset)
-            literal_cost = 9 * curr_length  # 1 flag bit + 8 data bits per byte
-
-            if match_cost >= literal_cost:
-                # Match is not beneficial, use literal (prefer literals when costs equal)
-                curr_length = 0
-
-        if curr_length >= 2:
-            # Encode match
-
-            # Flag bit 1
-            output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                output, bit_accum, bit_counter, flag_byte_ptr, 1
-            )
-
-            if 2 <= curr_length <= 5 and curr_offset <= 256:
-                # Short match
-                output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                    output, bit_accum, bit_counter, flag_byte_ptr, 0
-                )
-
-                len_bits = curr_length - 2
-                for i in range(2):
-                    output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                        output, bit_accum, bit_counter, flag_byte_ptr, (len_bits >> i) & 1
-                    )
-
-                output.append((curr_offset - 1) & 0xFF)
-            else:
-                # Long match
-                output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                    output, bit_accum, bit_counter, flag_byte_ptr, 1
-                )
-
-                if curr_length < 10:
-                    byte1 = ((curr_length - 2) << 5) | ((curr_offset - 1) & 0x1F)
-                    byte2 = ((curr_offset - 1) >> 5) & 0xFF
-                    output.append(byte1)
-                    output.append(byte2)
-                else:
-                    byte1 = (curr_offset - 1) & 0x1F
-                    byte2 = ((curr_offset - 1) >> 5) & 0xFF
-                    output.append(byte1)
-                    output.append(byte2)
-
-                    remaining = curr_length - 9
-                    while remaining >= 0xFF:
-                        output.append(0)
-                        remaining -= 0xFF
-                    output.append(remaining & 0xFF)
-
-            pos += curr_length
-        else:
-            # Encode literal
-            byte_val = buffered_data[pos]
-
-            output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-                output, bit_accum, bit_counter, flag_byte_ptr, 0
-            )
-            output.append(byte_val)
-
-            pos += 1
-
-    # Terminator
-    output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-        output, bit_accum, bit_counter, flag_byte_ptr, 1
-    )
-    output, bit_accum, bit_counter, flag_byte_ptr = add_bit(
-        output, bit_accum, bit_counter, flag_byte_ptr, 1
-    )
-
-    output.append(0x20)
-    output.append(0x00)
-
-    # Flush final bits
-    if bit_counter > 0:
-        output[flag_byte_ptr] = ((1 << bit_counter) - 1) & bit_accum
-
-    return bytes(output)
+    progress(done, total) and cancel (a CancellationToken) are passed through.
+    """
+    return lzss_compressor_final.compress_lzss_lazy(data, engine=engine, level=level,
+                                                    profile='options', progress=progress,
+                                                    cancel=cancel)[0]
 
 
 # ============================================================================
@@ -390,13 +193,19 @@ def build_section_header(section_num, compressed_data, uncompressed_size):
 # OPTIONS FILE SERIALIZATION
 # ============================================================================
 
-def serialize_options_file(section_files, output_file):
+def serialize_options_file(section_files, output_file, level=DEFAULT_COMPRESSION_LEVEL,
+                           progress=None, cancel=None):
     """
     Create a complete OPTIONS file from 3 decompressed section files
 
     Args:
         section_files: List of 3 paths to decompressed section files
         output_file: Path to output OPTIONS file
+        level: Compression level ('exact' matches the game byte for byte)
+        progress: Optional progress(done, total) callback over the
+            uncompressed bytes of all 3 sections
+        cancel: Optional CancellationToken; once cancelled, CompressionCancelled
+            is raised and no output file is written
 
     Returns:
         Dictionary with statistics and validation info
@@ -412,6 +221,8 @@ def serialize_options_file(section_files, output_file):
     }
 
     options_data = bytearray()
+    total = sum(os.path.getsize(path) for path in section_files if os.path.exists(path))
+    done_before = 0
 
     for section_num, section_file in enumerate(section_files, 1):
         print(f"\nProcessing Section {section_num}:")
@@ -428,7 +239,11 @@ def serialize_options_file(section_files, output_file):
         print(f"  Uncompressed size: {uncompressed_size} bytes")
 
         # Compress the section
-        compressed_data = compress_lzss_lazy(uncompressed_data)
+        section_progress = (None if progress is None else
+                            lambda done, _, base=done_before: progress(base + done, total))
+        compressed_data = compress_lzss_lazy(uncompressed_data, level=level,
+                                             progress=section_progress, cancel=cancel)
+        done_before += uncompressed_size
         compressed_size = len(compressed_data)
         print(f"  Compressed size: {compressed_size} bytes ({100*compressed_size/uncompressed_size:.1f}%)")
 
@@ -517,8 +332,11 @@ def validate_options_file(options_file, original_sections):
     for i, (section_num, start_offset, end_offset, compressed_data, header_info) in enumerate(sections):
         print(f"\nValidating Section {section_num}:")
 
-        # Decompress
-        decompressed = decompressor.decompress(compressed_data)
+        # Decompress (sized from the header; a mismatch is reported here)
+        decompressed, size_error = decompressor.decompress_checked(
+            compressed_data, header_info.uncompressed_length if header_info else None)
+        if size_error:
+            print(f"  Decompression error: {size_error}")
 
         # Read original
         with open(original_sections[i], 'rb') as f:
@@ -577,6 +395,9 @@ Examples:
     parser.add_argument('-o', '--output', required=True, help='Output OPTIONS file')
     parser.add_argument('--validate', action='store_true',
                        help='Validate by decompressing and comparing to original sections')
+    parser.add_argument('--level', choices=COMPRESSION_LEVELS, default=DEFAULT_COMPRESSION_LEVEL,
+                       help=f'Compression level (default: {DEFAULT_COMPRESSION_LEVEL}; '
+                            f'greedy/balanced are faster, optimal is smallest; only exact matches the game)')
 
     args = parser.parse_args()
 
@@ -586,7 +407,7 @@ Examples:
 
     # Serialize
     try:
-        results = serialize_options_file(args.sections, args.output)
+        results = serialize_options_file(args.sections, args.output, level=args.level)
     except Exception as e:
         print(f"\nERROR: {e}")
         return 1
@@ -385,8 +385,11 @@ def parse_savegame(filepath: str, output_dir: str = None, scan_types: bool = Fal
     print(f"  Expected:  0x{block1_header.checksum:08X}")
     print(f"  Calculated: 0x{calculated_checksum:08X}")
 
-    # Decompress
-    block1_decompressed = decompressor.decompress(block1_compressed)
+    # Decompress (sized from the header; a mismatch is reported below)
+    block1_decompressed, size_error = decompressor.decompress_checked(
+        block1_compressed, block1_header.uncompressed_size)
+    if size_error:
+        print(f"\nDecompression error: {size_error}")
     print(f"\nDecompressed size:  {len(block1_decompressed)} bytes")
     print(f"Expected size:      {block1_header.uncompressed_size} bytes")
     print(f"Size match:         {'PASS' if len(block1_decompressed) == block1_header.uncompressed_size else 'FAIL'}")
@@ -455,8 +458,11 @@ def parse_savegame(filepath: str, output_dir: str = None, scan_types: bool = Fal
     print(f"  Expected:  0x{block2_header.checksum:08X}")
     print(f"  Calculated: 0x{calculated_checksum:08X}")
 
-    # Decompress
-    block2_decompressed = decompressor.decompress(block2_compressed)
+    # Decompress (sized from the header; a mismatch is reported below)
+    block2_decompressed, size_error = decompressor.decompress_checked(
+        block2_compressed, block2_header.uncompressed_size)
+    if size_error:
+        print(f"\nDecompression error: {size_error}")
     print(f"\nDecompressed size:  {len(block2_decompressed)} bytes")
     print(f"Expected size:      {block2_header.uncompressed_size} bytes")
     print(f"Size match:         {'PASS' if len(block2_decompressed) == block2_header.uncompressed_size else 'FAIL'}")
@@ -23,7 +23,7 @@ import os
 import argparse
 
 # Import LZSS compressor
-from lzss_compressor_final import compress_lzss_lazy
+from lzss_compressor_final import compress_lzss_lazy, COMPRESSION_LEVELS, DEFAULT_COMPRESSION_LEVEL
 
 # =============================================================================
 # Scimitar Engine Type System - Hash Definitions
@@ -370,27 +370,48 @@ class SavSerializer:
         print(f"  Block 4: {len(self.block4_decompressed)} bytes (decompressed)")
         print(f"  Block 5: {len(self.block5_raw)} bytes (raw)")
 
-    def serialize(self) -> bytes:
-        """Serialize all blocks into a complete SAV file."""
+    def serialize(self, level: str = DEFAULT_COMPRESSION_LEVEL, progress=None,
+                  cancel=None) -> bytes:
+        """
+        Serialize all blocks into a complete SAV file.
+
+        level 'exact' (default) reproduces the game's compressed blocks;
+        'balanced' and 'greedy' compress faster with larger blocks, 'optimal'
+        produces the smallest blocks (slower than exact).
+
+        progress(done, total) reports the decompressed bytes of Blocks 1, 2
+        and 4 compressed so far. cancel is a CancellationToken; once it is
+        cancelled the current compression stops with CompressionCancelled.
+        """
         if any(b is None for b in [self.block1_decompressed, self.block2_decompressed,
                                     self.block3_raw, self.block4_decompressed, self.block5_raw]):
             raise ValueError("Not all blocks loaded")
 
-        print("\nCompressing blocks...")
+        total = (len(self.block1_decompressed) + len(self.block2_decompressed) +
+                 len(self.block4_decompressed))
+
+        def compress(data, done_before):
+            block_progress = (None if progress is None else
+                              lambda done, _: progress(done_before + done, total))
+            return compress_lzss_lazy(data, level=level, progress=block_progress, cancel=cancel)
+
+        print(f"\nCompressing blocks (level: {level})...")
 
         # Compress Block 1
         print("  Compressing Block 1...")
-        block1_compressed, _, s1_count1 = compress_lzss_lazy(self.block1_decompressed)
+        block1_compressed, _, s1_count1 = compress(self.block1_decompressed, 0)
         print(f"    {len(self.block1_decompressed)} -> {len(block1_compressed)} bytes (S1: {s1_count1})")
 
         # Compress Block 2
         print("  Compressing Block 2...")
-        block2_compressed, _, s1_count2 = compress_lzss_lazy(self.block2_decompressed)
+        block2_compressed, _, s1_count2 = compress(self.block2_decompressed,
+                                                   len(self.block1_decompressed))
         print(f"    {len(self.block2_decompressed)} -> {len(block2_compressed)} bytes (S1: {s1_count2})")
 
         # Compress Block 4
         print("  Compressing Block 4...")
-        block4_compressed, _, s1_count4 = compress_lzss_lazy(self.block4_decompressed)
+        block4_compressed, _, s1_count4 = compress(self.block4_decompressed,
+                                                   total - len(self.block4_decompressed))
         print(f"    {len(self.block4_decompressed)} -> {len(block4_compressed)} bytes (S1: {s1_count4})")
 
         # Calculate remaining file size for Block 2 header
@@ -486,6 +507,9 @@ def main():
     parser.add_argument('--compare', '-c', help='Original SAV file to compare against')
     parser.add_argument('--auto', '-a', action='store_true',
                         help='Auto-detect block files in current directory')
+    parser.add_argument('--level', choices=COMPRESSION_LEVELS, default=DEFAULT_COMPRESSION_LEVEL,
+                        help=f'Compression level (default: {DEFAULT_COMPRESSION_LEVEL}; '
+                             f'greedy/balanced are faster, optimal is smallest; only exact matches the game)')
 
     args = parser.parse_args()
 
@@ -516,7 +540,7 @@ def main():
     serializer.load_blocks(args.block1, args.block2, args.block3, args.block4, args.block5)
 
     # Serialize
-    output_data = serializer.serialize()
+    output_data = serializer.serialize(level=args.level)
 
     # Write output
     with open(args.output, 'wb') as f: